@@ -1,5 +1,7 @@
+from semantic_index import init_logging
 from semantic_index.api import create_app
 
+init_logging()
 app = create_app()
 
 # To run: uvicorn backend:app --host 0.0.0.0 --port 5000
@@ -0,0 +1,73 @@
+"""
+Compares the local CPU backends of the encoder: torch in float32, ONNX Runtime
+in float32 and ONNX Runtime with int8 weights. Reports the throughput of each
+on the same texts and the cosine similarity of their vectors to those of torch.
+
+The ONNX models are exported into embedding_factory.onnx_dir on first use, the
+number of threads is embedding_factory.onnx_threads. A GPU is not used.
+
+Usage (from the repository root, with the model of config.yaml):
+    python -m benchmarks.backends [--texts 512]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+# hide GPUs before torch is imported, the torch backend runs on the CPU then
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+from semantic_index.embeddings import GTEEmbeddingModel, OnnxEmbeddingModel
+from semantic_index.embeddings.model_onnx import cosine_similarities
+from .padding import _random_texts
+
+
+def _encode(model, texts: list[str]) -> tuple[np.ndarray, float]:
+    model.encode(texts[:16])  # warm up
+    started = time.perf_counter()
+    vectors = model.encode(texts)
+    return vectors, time.perf_counter() - started
+
+
+def run_benchmark(num_texts: int) -> None:
+    texts = _random_texts(num_texts, long_fraction=0.2, seed=0)
+    num_chars = sum(len(text) for text in texts)
+    print(f"{num_texts} texts, {num_chars} characters")
+    print(
+        f"{'backend':<14} {'seconds':>8} {'texts/s':>8} {'speedup':>8} "
+        f"{'cos min':>8} {'cos mean':>9}"
+    )
+
+    backends = [
+        ("torch fp32", lambda: GTEEmbeddingModel()),
+        ("onnx fp32", lambda: OnnxEmbeddingModel(quantize=False)),
+        ("onnx int8", lambda: OnnxEmbeddingModel(quantize=True)),
+    ]
+    reference, reference_seconds = None, None
+    for name, create in backends:
+        try:
+            model = create()
+        except ImportError as e:
+            print(f"{name:<14} skipped: {e}")
+            continue
+        vectors, seconds = _encode(model, texts)
+        if reference is None:
+            reference, reference_seconds = vectors, seconds
+        similarities = cosine_similarities(reference, vectors)
+        print(
+            f"{name:<14} {seconds:>8.2f} {num_texts / seconds:>8.1f} "
+            f"{reference_seconds / seconds:>7.2f}x {similarities.min():>8.5f} "
+            f"{similarities.mean():>9.5f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--texts", type=int, default=512)
+    args = parser.parse_args()
+
+    run_benchmark(args.texts)
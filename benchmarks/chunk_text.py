@@ -0,0 +1,78 @@
+"""
+Compares chunk_text against the implementation it replaced, for output and speed.
+
+Usage (from the repository root):
+    python -m benchmarks.chunk_text [--words 200000] [--repeat 3]
+"""
+
+import argparse
+import random
+import string
+import time
+
+from semantic_index.embeddings.chunk import chunk_text, iter_chunks
+from .legacy_chunk import legacy_chunk_text
+
+
+def _random_text(num_words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    separators = [" ", " ", " ", "\n", "\t", "  ", " \n\n "]
+    parts = []
+    for _ in range(num_words):
+        length = min(int(rng.expovariate(1 / 6)) + 1, 60)
+        parts.append("".join(rng.choices(string.ascii_letters, k=length)))
+        parts.append(rng.choice(separators))
+    return "".join(parts)
+
+
+def check_compatibility(cases: int = 2000) -> None:
+    rng = random.Random(0)
+    for case in range(cases):
+        text = _random_text(rng.randint(1, 400), seed=case)
+        size = rng.choice([1, 2, 5, 16, 64, 256, 1536])
+        for hard_cut in (False, True):
+            for overlap in (False, True):
+                expected = legacy_chunk_text(text, size, hard_cut, overlap)
+                chunks = chunk_text(text, size, hard_cut, overlap)
+                assert [(c.idx, c.text) for c in chunks] == list(
+                    expected
+                ), f"Mismatch for case {case}, {size=}, {hard_cut=}, {overlap=}"
+                normalized = " ".join(text.split())
+                for chunk in chunks:
+                    assert normalized[chunk.start : chunk.end] == chunk.text
+        streamed = list(iter_chunks(text.split(), size))
+        assert streamed == chunk_text(text, size), f"Streaming mismatch, {case=}"
+    print(f"{cases} random texts: output identical to the legacy implementation")
+
+
+def _best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(num_words: int, repeat: int) -> None:
+    text = _random_text(num_words, seed=42)
+    print(f"Text of {num_words} words, {len(text)} characters, best of {repeat}")
+    print(f"{'mode':<12} {'size':>6} {'legacy [s]':>11} {'new [s]':>9} {'speedup':>8}")
+    for hard_cut in (False, True):
+        for size in (256, 1536, 8192):
+            legacy = _best_of(repeat, legacy_chunk_text, text, size, hard_cut)
+            new = _best_of(repeat, chunk_text, text, size, hard_cut)
+            mode = "hard cut" if hard_cut else "words"
+            print(
+                f"{mode:<12} {size:>6} {legacy:>11.4f} {new:>9.4f} {legacy / new:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check_compatibility()
+    run_benchmark(args.words, args.repeat)
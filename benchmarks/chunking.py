@@ -0,0 +1,179 @@
+"""
+Re-chunks a sample of the indexed sources with different chunking settings and
+reports, for each setting, the number of chunks, the size of the index (float16
+vectors plus compressed chunk texts, as stored), the time to encode the chunks
+and the recall of source retrieval.
+
+Queries are runs of words sampled from the sources, a query is a hit if its
+source is among the top k sources ranked by their best matching chunk. Every
+setting is applied to all sampled sources, ignoring the chunking overrides.
+
+Settings are given as strategy:size:overlap for character chunking (e.g.
+sentence:1024:0.25) or tokens:max_tokens:overlap_tokens for token chunking.
+
+Usage (from the repository root, with the encoder of config.yaml):
+    python -m benchmarks.chunking [--sources 200] [--queries 200] [--top-k 10]
+        [--setting word:1536:0.5 --setting sentence:1536:0.25 ...]
+"""
+
+import argparse
+import dataclasses
+import random
+import time
+import zlib
+
+import numpy as np
+
+from semantic_index import get_manager
+from semantic_index.config import ChunkingConfig, config
+from semantic_index.embeddings import ChunkingMode, iter_separated_words
+
+DEFAULT_SETTINGS = [
+    "word:1536:0.5",
+    "word:1536:0.25",
+    "word:1536:0",
+    "sentence:1536:0.25",
+    "paragraph:1536:0.25",
+    "word:1024:0.25",
+    "word:2048:0",
+]
+_QUERY_WORDS = (8, 24)
+
+
+def parse_setting(setting: str) -> ChunkingConfig:
+    kind, size, overlap = setting.split(":")
+    if kind == ChunkingMode.TOKENS.value:
+        return dataclasses.replace(
+            config.chunking,
+            mode=ChunkingMode.TOKENS.value,
+            max_tokens=int(size),
+            overlap_tokens=int(overlap),
+            overrides={},
+        )
+    return dataclasses.replace(
+        config.chunking,
+        mode=ChunkingMode.CHARS.value,
+        strategy=kind,
+        size=int(size),
+        overlap=float(overlap),
+        overrides={},
+    )
+
+
+def load_corpus(num_sources: int, seed: int) -> list[str]:
+    """Reservoir sample of the texts of processed sources."""
+    manager = get_manager()
+    rng = random.Random(seed)
+    sample = []
+    for i, source in enumerate(manager.repo_source.iter_processed()):
+        if len(sample) < num_sources:
+            sample.append(source)
+        elif (j := rng.randrange(i + 1)) < num_sources:
+            sample[j] = source
+
+    texts = []
+    for source in sample:
+        try:
+            text = manager.processing_service.read_content(source)
+        except Exception as e:
+            print(f"Skipping {source.uri}: {e}")
+            continue
+        if text:
+            texts.append(text)
+    return texts
+
+
+def sample_queries(
+    texts: list[str], num_queries: int, seed: int
+) -> tuple[list[str], np.ndarray]:
+    rng = random.Random(seed)
+    queries, labels = [], []
+    for _ in range(num_queries):
+        label = rng.randrange(len(texts))
+        words = texts[label].split()
+        length = min(rng.randint(*_QUERY_WORDS), len(words))
+        start = rng.randrange(len(words) - length + 1)
+        queries.append(" ".join(words[start : start + length]))
+        labels.append(label)
+    return queries, np.array(labels)
+
+
+def _recall(
+    query_vectors: np.ndarray,
+    labels: np.ndarray,
+    vectors: np.ndarray,
+    chunk_sources: np.ndarray,
+    num_sources: int,
+    top_k: int,
+) -> float:
+    # the score of a source is that of its best chunk
+    scores = query_vectors @ vectors.T
+    source_scores = np.full((len(query_vectors), num_sources), -np.inf)
+    np.maximum.at(source_scores.T, chunk_sources, scores.T)
+    top = np.argsort(-source_scores, axis=1)[:, :top_k]
+    return float(np.mean(np.any(top == labels[:, None], axis=1)))
+
+
+def run_benchmark(
+    texts: list[str], settings: list[str], num_queries: int, top_k: int, seed: int
+) -> None:
+    factory = get_manager().embedding_factory
+    queries, labels = sample_queries(texts, num_queries, seed)
+    query_vectors = factory.model.encode(queries).astype(np.float32)
+
+    print(f"{len(texts)} sources, {len(queries)} queries, recall@{top_k}")
+    print(
+        f"{'setting':<22} {'chunks':>8} {'index [MB]':>11} "
+        f"{'encode [s]':>11} {'recall':>7}"
+    )
+    for setting in settings:
+        chunking = parse_setting(setting)
+        chunk_texts, chunk_sources = [], []
+        for source_idx, text in enumerate(texts):
+            words = iter_separated_words([text], normalized=True)
+            for chunk in factory.chunk_words(words, chunking):
+                chunk_texts.append(chunk.text)
+                chunk_sources.append(source_idx)
+
+        started = time.perf_counter()
+        vectors = factory.model.encode(chunk_texts).astype(np.float16)
+        encode_seconds = time.perf_counter() - started
+
+        index_bytes = vectors.nbytes + sum(
+            len(zlib.compress(text.encode("utf-8"))) for text in chunk_texts
+        )
+        recall = _recall(
+            query_vectors,
+            labels,
+            vectors.astype(np.float32),
+            np.array(chunk_sources),
+            len(texts),
+            top_k,
+        )
+        print(
+            f"{setting:<22} {len(chunk_texts):>8} {index_bytes / 1e6:>11.2f} "
+            f"{encode_seconds:>11.2f} {recall:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--setting", action="append", dest="settings")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.sources, args.seed)
+    if not corpus:
+        raise SystemExit("No processed sources to sample from, process some first.")
+    run_benchmark(
+        corpus,
+        args.settings or DEFAULT_SETTINGS,
+        args.queries,
+        args.top_k,
+        args.seed,
+    )
@@ -0,0 +1,55 @@
+"""
+Measures the encoding throughput of the local model in this process and of
+encoder pools of different sizes, each worker using an equal share of the CPU
+cores, to see how far embedding scales with the number of cores.
+
+Usage (from the repository root, with the model and backend of config.yaml):
+    python -m benchmarks.encoder_pool [--texts 2000] [--workers 2 --workers 4 ...]
+"""
+
+import argparse
+import os
+import time
+
+from semantic_index.embeddings import EncoderPool, create_local_model
+from .padding import _random_texts
+
+
+def _throughput(model, texts: list[str]) -> float:
+    model.encode(texts[:64])  # warm up
+    started = time.perf_counter()
+    model.encode(texts)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def run_benchmark(num_texts: int, pool_sizes: list[int]) -> None:
+    texts = _random_texts(num_texts, long_fraction=0.2, seed=0)
+    cores = os.cpu_count() or 1
+    print(f"{num_texts} texts, {cores} CPU cores")
+    print(f"{'workers':>8} {'threads':>8} {'texts/s':>9} {'speedup':>8}")
+
+    baseline = _throughput(create_local_model(), texts)
+    print(f"{'-':>8} {'all':>8} {baseline:>9.1f} {1.0:>7.2f}x")
+    for workers in pool_sizes:
+        threads = max(1, cores // workers)
+        pool = EncoderPool(workers, threads)
+        try:
+            throughput = _throughput(pool, texts)
+        finally:
+            pool.shutdown()
+        print(
+            f"{workers:>8} {threads:>8} {throughput:>9.1f} "
+            f"{throughput / baseline:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--workers", type=int, action="append", dest="pool_sizes")
+    args = parser.parse_args()
+
+    default_sizes = [n for n in (2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)]
+    run_benchmark(args.texts, args.pool_sizes or default_sizes or [2])
@@ -0,0 +1,102 @@
+"""
+Checks the startup time of the command line and the package against a budget:
+the wall time of `python index.py --help` and of importing semantic_index, each
+the best of a few fresh interpreters, and that none of the heavy libraries
+(models, file parsers, web framework) are imported before they are used.
+Exits with status 1 if the budget is exceeded or a heavy library is imported.
+
+Usage (from the repository root):
+    python -m benchmarks.import_time [--budget 1.0] [--repeat 5] [--top 10]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# imported on first use only, by the backends, readers and servers
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "onnxruntime",
+    "pandas",
+    "pymupdf",
+    "docx",
+    "extract_msg",
+    "odf",
+    "fastapi",
+]
+
+_CHECK_MODULES = (
+    "import sys, semantic_index; "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def _best_wall_time(command: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _slowest_imports(top: int) -> list[tuple[int, str]]:
+    # cumulative microseconds per module as reported by -X importtime
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import semantic_index"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def run_check(budget: float, repeat: int, top: int) -> bool:
+    ok = True
+    interpreter = _best_wall_time([sys.executable, "-c", "pass"], repeat)
+    print(f"{'python -c pass':<32} {interpreter:>7.3f} s")
+    for name, command in (
+        ("import semantic_index", [sys.executable, "-c", "import semantic_index"]),
+        ("python index.py --help", [sys.executable, "index.py", "--help"]),
+    ):
+        seconds = _best_wall_time(command, repeat)
+        within = seconds <= budget
+        ok &= within
+        print(f"{name:<32} {seconds:>7.3f} s {'ok' if within else 'OVER BUDGET'}")
+
+    result = subprocess.run(
+        [sys.executable, "-c", _CHECK_MODULES],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    if heavy:
+        ok = False
+        print(f"Heavy modules imported by semantic_index: {', '.join(heavy)}")
+
+    print("\nSlowest imports of semantic_index (cumulative):")
+    for microseconds, module in _slowest_imports(top):
+        print(f"{microseconds / 1e6:>7.3f} s  {module}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if not run_check(args.budget, args.repeat, args.top):
+        sys.exit(1)
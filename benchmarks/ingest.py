@@ -0,0 +1,138 @@
+"""
+Measures how many sources per second ingestion writes to a fresh SQLite
+database, for the first ingest of a share (inserts with tags) and for a re-scan
+of it (updates), with different batch sizes. With --legacy, also measures the
+previous implementation that looked up every source with its own query.
+
+Usage (from the repository root):
+    python -m benchmarks.ingest [--sources 100000] [--batch 100 --batch 1000 ...]
+        [--legacy]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Generator, Sequence
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from semantic_index.data import (
+    Base,
+    Source,
+    SourceHandlerRepository,
+    SourceRepository,
+    Tag,
+    TagRepository,
+)
+
+DEFAULT_BATCH_SIZES = [100, 1000, 5000]
+_NUM_TAGS = 3
+
+
+def _legacy_upsert_many(
+    session_factory: Callable, sources: Sequence[Source]
+) -> tuple[int, int]:
+    # SourceRepository.upsert_many before the bulk implementation
+    updated, inserted = 0, 0
+    with session_factory() as session:
+        for source in sources:
+            stmt = select(Source).where(Source.uri == source.uri)
+            existing = session.execute(stmt).scalar_one_or_none()
+            if not existing:
+                source.tags = [session.merge(tag) for tag in source.tags]
+                session.add(source)
+                inserted += 1
+                continue
+            existing.obj_created = source.obj_created
+            existing.obj_modified = source.obj_modified
+            existing.obj_size = source.obj_size
+            existing.last_checked = datetime.now()
+            existing.title = source.title
+            updated += 1
+    return updated, inserted
+
+
+def _session_factory(url: str) -> Callable:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+
+    @contextmanager
+    def session() -> Generator[Session, None, None]:
+        with factory() as s:
+            yield s
+            s.commit()
+
+    return session
+
+
+def _sources(handler_id: int, tags: list[Tag], count: int, scan: int):
+    modified = datetime(2024, 1, 1) + timedelta(days=scan)
+    for i in range(count):
+        yield Source(
+            id=None,
+            source_handler_id=handler_id,
+            uri=f"/share/dir{i // 1000}/file{i}.txt",
+            resolved_to=f"file:///share/dir{i // 1000}/file{i}.txt",
+            title=f"file{i}.txt",
+            obj_created=datetime(2024, 1, 1),
+            obj_modified=modified,
+            obj_size=i,
+            last_checked=datetime.now(),
+            last_processed=None,
+            error=False,
+            error_message=None,
+            tags=tags,
+        )
+
+
+def _ingest(upsert: Callable, sources: list[Source], batch_size: int) -> float:
+    # like ProcessingService.ingest_sources, the sources are created before
+    # so only the writes are timed
+    started = time.perf_counter()
+    for i in range(0, len(sources), batch_size):
+        upsert(sources[i : i + batch_size])
+    return time.perf_counter() - started
+
+
+def run_benchmark(num_sources: int, batch_sizes: list[int], legacy: bool) -> None:
+    print(f"{num_sources} sources with {_NUM_TAGS} tags each, SQLite")
+    print(f"{'':<8} {'batch':>6} {'ingest [rows/s]':>16} {'rescan [rows/s]':>16}")
+    variants = [("bulk", size) for size in batch_sizes]
+    if legacy:
+        variants += [("legacy", size) for size in batch_sizes]
+
+    for name, batch_size in variants:
+        with tempfile.TemporaryDirectory() as directory:
+            session_factory = _session_factory(
+                f"sqlite:///{os.path.join(directory, 'ingest.sqlite')}"
+            )
+            handler = SourceHandlerRepository(session_factory).get_or_create("File")
+            tag_repo = TagRepository(session_factory)
+            tags = [tag_repo.get_or_create(f"tag{i}") for i in range(_NUM_TAGS)]
+            if name == "bulk":
+                upsert = SourceRepository(session_factory).upsert_many
+            else:
+                upsert = lambda batch: _legacy_upsert_many(session_factory, batch)
+
+            rates = []
+            for scan in range(2):
+                sources = list(_sources(handler.id, tags, num_sources, scan))
+                rates.append(num_sources / _ingest(upsert, sources, batch_size))
+            print(f"{name:<8} {batch_size:>6} {rates[0]:>16.0f} {rates[1]:>16.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sources", type=int, default=100000)
+    parser.add_argument("--batch", type=int, action="append", dest="batch_sizes")
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    run_benchmark(args.sources, args.batch_sizes or DEFAULT_BATCH_SIZES, args.legacy)
@@ -0,0 +1,84 @@
+"""
+Measures how much of the encoder's work is spent on padding when texts are
+batched in input order versus sorted by token length, and the encode time of
+both, on a mix of short (e.g. Jira comments) and long (chunks of documents)
+texts.
+
+Usage (from the repository root, with the encoder of config.yaml):
+    python -m benchmarks.padding [--texts 2000] [--long-fraction 0.2]
+"""
+
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+
+from semantic_index import get_manager
+from semantic_index.config import config
+
+
+def _random_texts(num_texts: int, long_fraction: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    texts = []
+    for _ in range(num_texts):
+        if rng.random() < long_fraction:
+            num_words = rng.randint(150, 250)
+        else:
+            num_words = rng.randint(5, 40)
+        texts.append(" ".join(rng.choices(vocabulary, k=num_words)))
+    return texts
+
+
+def padding_efficiency(
+    lengths: np.ndarray, order: np.ndarray, batch_size: int
+) -> float:
+    """Fraction of the tokens run through the encoder that are not padding."""
+    tokens, padded = 0, 0
+    for i in range(0, len(order), batch_size):
+        batch = lengths[order[i : i + batch_size]]
+        tokens += int(batch.sum())
+        padded += int(batch.max()) * len(batch)
+    return tokens / padded
+
+
+def run_benchmark(texts: list[str], repeat: int) -> None:
+    model = get_manager().embedding_factory.model
+    batch_size = config.embedding_factory.batch_size
+    lengths = np.asarray(model._text_lengths(texts))
+    orders = {
+        "input order": np.arange(len(texts)),
+        "by length": np.argsort(-lengths, kind="stable"),
+    }
+
+    print(f"{len(texts)} texts, batch size {batch_size}, best of {repeat}")
+    print(f"{'batching':<12} {'efficiency':>11} {'encode [s]':>11}")
+    results = {}
+    for name, order in orders.items():
+        efficiency = padding_efficiency(lengths, order, batch_size)
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results[name] = model.encode(texts, sort_by_length=name == "by length")
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<12} {efficiency:>11.3f} {best:>11.2f}")
+
+    # the order of the results must not depend on the batching
+    difference = np.abs(results["input order"] - results["by length"]).max()
+    print(f"max difference of the embeddings: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--long-fraction", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run_benchmark(_random_texts(args.texts, args.long_fraction, args.seed), args.repeat)
@@ -0,0 +1,90 @@
+"""
+Compares the response formats of the embedding factory: JSON lists of floats
+and float16 bytes, for the size of a response and the time to produce and to
+parse it. With --remote, also measures the throughput of the remote encoder of
+config.yaml with each format.
+
+Usage (from the repository root):
+    python -m benchmarks.transport [--batch 32] [--dims 768] [--remote]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from semantic_index.embeddings import (
+    EMBEDDINGS_MEDIA_TYPE,
+    RemoteEmbeddingModel,
+    decode_embeddings,
+    encode_embeddings,
+)
+from .padding import _random_texts
+
+
+def _best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def compare_formats(batch: int, dims: int, repeat: int) -> None:
+    vectors = np.random.default_rng(0).standard_normal((batch, dims))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(
+        np.float32
+    )
+    as_json = json.dumps(vectors.tolist()).encode("utf-8")
+    as_bytes = encode_embeddings(vectors)
+
+    print(f"Response for {batch} vectors of {dims} dimensions, best of {repeat}")
+    print(f"{'format':<8} {'bytes':>10} {'encode [ms]':>12} {'decode [ms]':>12}")
+    encode_json = _best_of(repeat, lambda: json.dumps(vectors.tolist()).encode())
+    decode_json = _best_of(repeat, lambda: np.array(json.loads(as_json)))
+    print(
+        f"{'json':<8} {len(as_json):>10} {encode_json * 1e3:>12.2f} "
+        f"{decode_json * 1e3:>12.2f}"
+    )
+    encode_binary = _best_of(repeat, encode_embeddings, vectors)
+    decode_binary = _best_of(repeat, decode_embeddings, as_bytes)
+    print(
+        f"{'float16':<8} {len(as_bytes):>10} {encode_binary * 1e3:>12.2f} "
+        f"{decode_binary * 1e3:>12.2f}"
+    )
+
+
+def compare_remote(num_texts: int) -> None:
+    texts = _random_texts(num_texts, long_fraction=0.2, seed=0)
+    model = RemoteEmbeddingModel()
+    hosts = ", ".join(host.url for host in model.hosts)
+    print(f"Remote encoders at {hosts}, {num_texts} texts")
+    model.encode(texts[:64])  # warm up
+    for name, accept in (
+        ("json", "application/json"),
+        ("float16", EMBEDDINGS_MEDIA_TYPE),
+    ):
+        model.session.headers["Accept"] = accept
+        started = time.perf_counter()
+        model.encode(texts)
+        seconds = time.perf_counter() - started
+        print(f"{name:<8} {seconds:>8.2f} s {num_texts / seconds:>9.1f} texts/s")
+    model.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--remote", action="store_true")
+    parser.add_argument("--texts", type=int, default=2000)
+    args = parser.parse_args()
+
+    compare_formats(args.batch, args.dims, args.repeat)
+    if args.remote:
+        compare_remote(args.texts)
@@ -7,7 +7,17 @@ if alembic_config.config_file_name is not None:
     fileConfig(alembic_config.config_file_name)
 
 from semantic_index.data.database import Base, get_engine
-from semantic_index.data import SourceHandler, Source, SourceTag, Tag, Embedding
+from semantic_index.data import (
+    SourceHandler,
+    Source,
+    SourceContent,
+    SourceTag,
+    Tag,
+    Embedding,
+    ProcessingRun,
+    ProcessingJournal,
+    SparsePosting,
+)
 
 target_metadata = Base.metadata
 
@@ -1,10 +1,27 @@
-from fastapi import FastAPI
-from pydantic import BaseModel, field_validator
+import asyncio
+import queue
 
-from semantic_index import GTEEmbeddingModel
+from fastapi import FastAPI, Header, HTTPException, Response
+from pydantic import BaseModel, field_validator
 
+from semantic_index import (
+    EMBEDDINGS_MEDIA_TYPE,
+    MicroBatcher,
+    config,
+    create_local_model,
+    encode_embeddings,
+    init_logging,
+    metrics_router,
+)
+
+init_logging()
 app = FastAPI()
-model = GTEEmbeddingModel()
+app.include_router(metrics_router)
+model = create_local_model()
+if config.embedding_factory.warmup:
+    model.warmup()
+# concurrent requests are encoded together in the batcher's thread
+batcher = MicroBatcher(model, config.embedding_server)
 
 
 class EmbeddingRequest(BaseModel):
@@ -19,8 +36,19 @@ class EmbeddingRequest(BaseModel):
 
 
 @app.post("/generate_embedding")
-async def generate_embedding(request: EmbeddingRequest):
-    return model._encode_batch(request.batch).tolist()
+async def generate_embedding(
+    request: EmbeddingRequest, accept: str = Header(default="")
+):
+    try:
+        future = batcher.submit(request.batch)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Too many queued requests")
+    embeddings = await asyncio.wrap_future(future)
+    if EMBEDDINGS_MEDIA_TYPE in accept:
+        return Response(
+            content=encode_embeddings(embeddings), media_type=EMBEDDINGS_MEDIA_TYPE
+        )
+    return embeddings.tolist()
 
 
 @app.get("/")
@@ -1,8 +1,16 @@
 import argparse
+import json
 import logging
 import sys
 
-from semantic_index import get_manager, Manager, SearchRequest, SearchDateFilter
+from semantic_index import (
+    get_manager,
+    init_logging,
+    metrics,
+    Manager,
+    SearchRequest,
+    SearchDateFilter,
+)
 
 
 def init_parser():
@@ -30,6 +38,20 @@ def init_parser():
         help="Process all sources",
     )
 
+    parser.add_argument(
+        "--max-sources",
+        type=int,
+        metavar="COUNT",
+        help="Stop processing after this many sources (used with --process)",
+    )
+
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        metavar="SECONDS",
+        help="Stop processing new sources after this many seconds (used with --process)",
+    )
+
     parser.add_argument(
         "-pp",
         "--process-one",
@@ -38,6 +60,20 @@ def init_parser():
         help="Process a single source by its ID",
     )
 
+    parser.add_argument(
+        "-rp",
+        "--reprocess",
+        action="store_true",
+        help="Reprocess all processed sources, reading their text from the content store where possible",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--watch",
+        metavar="DIRECTORY",
+        help="Watch a directory, ingest and process changed files continuously until interrupted",
+    )
+
     parser.add_argument(
         "-s",
         "--search",
@@ -52,6 +88,18 @@ def init_parser():
         default=5,
         help="Number of results to return for KNN search (default: 5)",
     )
+
+    parser.add_argument(
+        "--search-mode",
+        choices=["dense", "sparse", "hybrid"],
+        help="Scoring of the search (default: search.mode of the config)",
+    )
+
+    parser.add_argument(
+        "--profile-encoder",
+        action="store_true",
+        help="Print where the encoder spent its time (tokenize, transfer, forward)",
+    )
     return parser
 
 
@@ -107,7 +155,10 @@ def handle_process(manager: Manager, args: argparse.Namespace):
         return
 
     logging.info("Processing all sources")
-    manager.processing_service.process_pending_sources()
+    manager.processing_service.process_pending_sources(
+        max_sources=args.max_sources,
+        time_budget=args.time_budget,
+    )
     logging.info("Processed all sources")
     logging.info("-" * 40)
 
@@ -128,6 +179,16 @@ def handle_process_one(manager: Manager, args: argparse.Namespace):
     logging.info("-" * 40)
 
 
+def handle_reprocess(manager: Manager, args: argparse.Namespace):
+    if not args.reprocess:
+        return
+
+    logging.info("Reprocessing all processed sources")
+    manager.processing_service.reprocess_all_sources()
+    logging.info("Reprocessed all sources")
+    logging.info("-" * 40)
+
+
 def handle_search(manager: Manager, args: argparse.Namespace):
     if not args.search:
         return
@@ -142,6 +203,7 @@ def handle_search(manager: Manager, args: argparse.Namespace):
             modifieddate_end=None,
         ),
         limit=args.kcount,
+        mode=args.search_mode,
     )
     results = manager.search_service.search_documents(search)
     logging.info(f"Top {args.kcount} results for: '{args.search}'")
@@ -151,7 +213,17 @@ def handle_search(manager: Manager, args: argparse.Namespace):
         )
 
 
+def handle_watch(manager: Manager, args: argparse.Namespace):
+    if not args.watch:
+        return
+
+    logging.info(f"Watching {args.watch} for changes, press Ctrl+C to stop")
+    manager.watch_service.watch(args.watch)
+    logging.info("-" * 40)
+
+
 if __name__ == "__main__":
+    init_logging()
     parser = init_parser()
     args = parser.parse_args()
     if not (
@@ -159,7 +231,9 @@ if __name__ == "__main__":
         or args.ingest_one
         or args.process
         or args.process_one
+        or args.reprocess
         or args.search
+        or args.watch
     ):
         logging.error(parser.format_help())
         sys.exit(1)
@@ -169,6 +243,15 @@ if __name__ == "__main__":
     handle_ingest_one(manager, args)
     handle_process(manager, args)
     handle_process_one(manager, args)
+    handle_reprocess(manager, args)
     handle_search(manager, args)
+    handle_watch(manager, args)
+
+    if args.profile_encoder:
+        stats = manager.embedding_factory.stats()
+        logging.info(f"Encoder profile:\n{stats.format()}")
 
+    summary = metrics.summary()
+    if summary:
+        logging.info(f"Metrics summary:\n{json.dumps(summary, indent=2)}")
     logging.info("Semantic Index Manager exiting.")
@@ -3,15 +3,26 @@ import os
 import sys
 from datetime import datetime
 
+from . import api, embeddings
 from .api import *
 from .data import *
 from .embeddings import *
 from .services import *
 from .sources import *
 from .config import *
+from .metrics import metrics
+
+
+def __getattr__(name: str):
+    # names the subpackages import on first access, e.g. the embedding models
+    for package in (embeddings, api):
+        if name in package._LAZY:
+            return getattr(package, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def init_logging():
+    """Logs to the console and a new file in the log folder, see config.yaml."""
     os.makedirs(config.log_folder, exist_ok=True)
 
     log_filename = os.path.join(
@@ -29,6 +40,3 @@ def init_logging():
         format="%(asctime)s [ %(levelname)s ] %(message)s",
         handlers=[file_handler, stream_handler],
     )
-
-
-init_logging()
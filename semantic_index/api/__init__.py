@@ -1,16 +1,47 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import importlib
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
 
+from ..config import config
 from .dto import *
-from .routes import router
 from .manager import Manager, get_manager
 
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+# the routes import FastAPI, which the command line does not need
+_LAZY = {"router": ".routes", "metrics_router": ".routes"}
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        module = importlib.import_module(_LAZY[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY])
+
+
+def create_app() -> "FastAPI":
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+
+    from .routes import metrics_router, router
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # requests are served once the model is ready
+        if config.embedding_factory.warmup:
+            get_manager().warmup()
+        yield
 
-def create_app() -> FastAPI:
     app = FastAPI(
         title="Semantic Index API",
         description="API for semantic search over indexed documents",
         version="1.0.0",
+        lifespan=lifespan,
     )
     app.add_middleware(
         CORSMiddleware,
@@ -20,4 +51,5 @@ def create_app() -> FastAPI:
         allow_credentials=True,
     )
     app.include_router(router)
+    app.include_router(metrics_router)
     return app
@@ -4,4 +4,5 @@ from .search_date_filter import SearchDateFilter
 from .search_request import SearchRequest
 from .search_response import SearchResponse
 from .histogram_response import HistogramResponse
+from .pending_count import PendingCount
 from .tag_count import TagCount
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class PendingCount(BaseModel):
+    count: int
+    retry_due: int
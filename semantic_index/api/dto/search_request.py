@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 from .search_date_filter import SearchDateFilter
 
@@ -9,6 +9,8 @@ class SearchRequest(BaseModel):
     limit: int = Field(default=10, ge=1, le=100)
     date_filter: SearchDateFilter = Field(...)
     tag_ids: Optional[List[int]] = Field(default=None)
+    # scoring of the chunks, search.mode of the config if not set
+    mode: Optional[Literal["dense", "sparse", "hybrid"]] = Field(default=None)
 
     @field_validator("query")
     @classmethod
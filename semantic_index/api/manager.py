@@ -4,12 +4,15 @@ import threading
 from ..data import (
     init_db,
     EmbeddingRepository,
+    ProcessingJournalRepository,
+    SourceContentRepository,
     SourceHandlerRepository,
     SourceRepository,
+    SparsePostingRepository,
     TagRepository,
 )
 from ..embeddings import EmbeddingFactory
-from ..services import ProcessingService, SearchService
+from ..services import ProcessingService, SearchService, WatchService
 from ..sources import Handler, FileSourceHandler, JiraSourceHandler
 
 logger = logging.getLogger(__name__)
@@ -25,6 +28,9 @@ class Manager:
         self.repo_source = SourceRepository()
         self.repo_tag = TagRepository()
         self.repo_embedding = EmbeddingRepository()
+        self.repo_sparse = SparsePostingRepository()
+        self.repo_content = SourceContentRepository()
+        self.repo_journal = ProcessingJournalRepository()
 
         self.handler = Handler(
             [
@@ -36,15 +42,22 @@ class Manager:
         self.embedding_factory = EmbeddingFactory()
         self._processing_service = None
         self._search_service = None
+        self._watch_service = None
 
         logger.info("Semantic Index Manager initialized.")
 
+    def warmup(self) -> None:
+        """Prepares the embedding model, so the first search is not slower."""
+        self.embedding_factory.warmup()
+
     @property
     def processing_service(self) -> ProcessingService:
         if self._processing_service is None:
             self._processing_service = ProcessingService(
                 source_repo=self.repo_source,
                 embedding_repo=self.repo_embedding,
+                content_repo=self.repo_content,
+                journal_repo=self.repo_journal,
                 embedding_factory=self.embedding_factory,
                 handler=self.handler,
             )
@@ -56,10 +69,23 @@ class Manager:
             self._search_service = SearchService(
                 embedding_repo=self.repo_embedding,
                 source_repo=self.repo_source,
+                sparse_repo=self.repo_sparse,
                 embedding_factory=self.embedding_factory,
             )
         return self._search_service
 
+    @property
+    def watch_service(self) -> WatchService:
+        if self._watch_service is None:
+            file_handler = self.handler.find_by_name("File")
+            assert isinstance(file_handler, FileSourceHandler)
+            self._watch_service = WatchService(
+                processing_service=self.processing_service,
+                source_repo=self.repo_source,
+                file_handler=file_handler,
+            )
+        return self._watch_service
+
 
 _manager: Manager = None  # type: ignore
 _init_lock = threading.Lock()
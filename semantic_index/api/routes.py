@@ -1,7 +1,10 @@
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from typing import Callable, List
 
+from ..metrics import metrics
 from .manager import Manager, get_manager
 from .dto import (
     SourceSchema,
@@ -10,11 +13,13 @@ from .dto import (
     SearchResponse,
     ReadContentResult,
     HistogramResponse,
+    PendingCount,
     TagCount,
 )
 
 
 router = APIRouter(prefix="/api")
+metrics_router = APIRouter()
 
 
 @router.get("/", response_model=dict)
@@ -26,7 +31,11 @@ def _search_with_date_filter(
     request: SearchRequest,
     target_fn: Callable[[SearchRequest], list[SearchResponse]],
 ) -> list[SearchResponse]:
-    results = target_fn(request)
+    try:
+        results = target_fn(request)
+    except ValueError as e:
+        # e.g. a sparse search without sparse weights
+        raise HTTPException(status_code=400, detail=str(e))
     return [
         SearchResponse(
             source=SourceSchema.model_validate(r.source),
@@ -73,12 +82,8 @@ async def read_content_by_embedding_id(
     if emb is None:
         raise KeyError(f"Embedding {id_} not found")
 
-    source = await run_in_threadpool(manager.repo_source.get_by_id, emb.source_id)
-    if source is None:
-        raise KeyError(f"Source for embedding {id_} not found")
-
     content = await run_in_threadpool(
-        manager.processing_service.read_chunk_content, source, emb.chunk_idx
+        manager.processing_service.read_embedding_content, emb
     )
     return ReadContentResult(section=content)
 
@@ -97,9 +102,28 @@ async def get_modifydate_histogram(
     return await run_in_threadpool(manager.repo_source.get_modifydate_histogram)
 
 
+@router.get("/source/pending/count", response_model=PendingCount)
+async def get_pending_count(
+    manager: Manager = Depends(get_manager),
+) -> PendingCount:
+    count = await run_in_threadpool(manager.repo_source.count_pending)
+    retry_due = await run_in_threadpool(
+        manager.repo_source.count_retry_due, datetime.now()
+    )
+    return PendingCount(count=count, retry_due=retry_due)
+
+
 @router.get("/tags", response_model=List[TagCount])
 async def get_tags(
     manager: Manager = Depends(get_manager),
 ) -> List[TagCount]:
     data = await run_in_threadpool(manager.repo_tag.get_counted)
     return data
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
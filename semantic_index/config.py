@@ -1,4 +1,4 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 import yaml
 
@@ -11,12 +11,174 @@ class DatabaseConfig:
 
 @dataclass(frozen=True)
 class EmbeddingFactoryConfig:
+    model_name: str = "Alibaba-NLP/gte-multilingual-base"
+    # directory with the model's files (e.g. from huggingface-cli download
+    # --local-dir), loaded without network access instead of by model_name
+    model_path: str = ""
+    # load model_name from the local Hugging Face cache only
+    offline: bool = False
+    # encode a few texts when the API or embedding server starts, so the first
+    # request does not pay for allocations and kernel selection
+    warmup: bool = True
+    # compile the torch model (torch.compile), the compiled kernels are cached
+    # in compile_cache_dir and reused on the next start
+    compile: bool = False
+    compile_cache_dir: str = "models/compile_cache"
     batch_size: int = 32
+    # maximum number of tokens (including padding) per batch, instead of
+    # batch_size texts if greater than 0
+    max_batch_tokens: int = 8192
+    # measure the throughput of these budgets when the model is loaded and
+    # use the fastest one
+    autotune: bool = False
+    autotune_candidates: list[int] = field(
+        default_factory=lambda: [2048, 4096, 8192, 16384, 32768]
+    )
+    # batch texts of similar token length together to reduce padding
+    sort_by_length: bool = True
+    # also store the sparse lexical weights of each chunk (token id to weight)
+    # from the same forward pass in an inverted index, for sparse and hybrid
+    # search; torch backend only, weights up to sparse_min_weight are dropped
+    sparse: bool = False
+    sparse_min_weight: float = 0.0
+    # local inference: "torch", "onnx" (ONNX Runtime on the CPU) or "auto"
+    # (torch on a GPU, onnx otherwise)
+    backend: str = "torch"
+    # exported ONNX models are cached below this directory
+    onnx_dir: str = "models"
+    # int8 weights (dynamic quantization) instead of float32
+    onnx_quantize: bool = True
+    # threads per inference, 0 for one per physical core
+    onnx_threads: int = 0
+    # compare an exported model with the torch model, and reject it if the
+    # cosine similarity of any sample text is below onnx_min_similarity
+    onnx_parity_check: bool = True
+    onnx_min_similarity: float = 0.99
+    # encode batches in parallel in this many worker processes with a copy of
+    # the local model each (CPU inference), in this process if 0 or 1
+    pool_workers: int = 0
+    # threads per worker, 0 for an equal share of the CPU cores
+    pool_threads_per_worker: int = 0
     process_remote: bool = False
     remote_host: str = "http://localhost"
     remote_port: int = 8000
+    # several embedding factories, e.g. [{url: "http://a:8000", weight: 2}],
+    # instead of remote_host and remote_port; batches go to the host with the
+    # fewest outstanding batches relative to its weight
+    remote_hosts: list[dict] = field(default_factory=list)
+    # evicted hosts are re-admitted once their health check succeeds
+    remote_health_check_seconds: float = 10
     remote_endpoint: str = "/encode"
     timeout_seconds: int = 30
+    # batches in flight at once per host, each on a pooled connection
+    remote_concurrency: int = 4
+    # failed connections and 429/502/503/504 responses are retried with an
+    # exponential backoff starting at remote_backoff_seconds
+    remote_retries: int = 3
+    remote_backoff_seconds: float = 0.5
+    # receive vectors as float16 bytes instead of JSON if the server supports it
+    remote_binary: bool = True
+
+
+@dataclass(frozen=True)
+class EmbeddingServerConfig:
+    # the embedding factory (embedding_factory.py) encodes the texts of
+    # concurrent requests together, up to max_batch_texts texts, waiting at
+    # most max_wait_ms for more requests after the first one
+    max_batch_texts: int = 256
+    max_wait_ms: float = 5
+    # requests beyond this are rejected (503) until the queue drains
+    max_queued_requests: int = 1024
+
+
+@dataclass(frozen=True)
+class SearchConfig:
+    # "dense" (cosine similarity), "sparse" (lexical weights, requires
+    # embedding_factory.sparse) or "hybrid", if a request does not choose
+    mode: str = "dense"
+    # hybrid score: dense similarity + hybrid_sparse_weight * sparse score
+    hybrid_sparse_weight: float = 0.3
+
+
+@dataclass(frozen=True)
+class ChunkingConfig:
+    # "chars": chunks of up to size characters at word boundaries,
+    # "tokens": chunks of up to max_tokens tokens of the encoder's tokenizer,
+    # so the encoder never truncates a chunk
+    mode: str = "chars"
+    size: int = 1536
+    # fraction of the size shared by consecutive chunks
+    overlap: float = 0.5
+    # where chunks end preferably in "chars" mode: "word", "sentence",
+    # "paragraph" or "page" (also sheets)
+    strategy: str = "word"
+    # including special tokens, capped at the maximum length of the model
+    max_tokens: int = 512
+    # tokens shared by consecutive chunks
+    overlap_tokens: int = 64
+    # settings above by source handler name (e.g. "Jira") or file extension
+    # (e.g. ".xlsx"), the extension takes precedence
+    overrides: dict[str, dict] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for key, settings in self.overrides.items():
+            try:
+                replace(self, **settings, overrides={})
+            except TypeError as e:
+                raise ValueError(f"Invalid chunking override {key}: {e}") from e
+
+    def for_source(self, handler_name: str, extension: str) -> "ChunkingConfig":
+        overrides = {key.lower(): value for key, value in self.overrides.items()}
+        settings = overrides.get(extension.lower()) if extension else None
+        if settings is None:
+            settings = overrides.get(handler_name.lower())
+        if settings is None:
+            return self
+        return replace(self, **settings, overrides={})
+
+
+@dataclass(frozen=True)
+class ProcessingConfig:
+    # sources whose processing was interrupted (crash, OOM) this often within
+    # one run are marked as failed instead of being retried on resume
+    max_interruptions: int = 2
+    # order of pending sources: "recent" (most recently modified first),
+    # "smallest" (smallest first) or "id" (ingestion order)
+    policy: str = "recent"
+    # share processing time equally between the source handlers
+    fair_share: bool = True
+    # failed sources with transient errors or timeouts are retried with
+    # exponential backoff: base, 2 * base, 4 * base, ... capped at max
+    retry_max_attempts: int = 5
+    retry_base_seconds: int = 300
+    retry_max_seconds: int = 86400
+    # sources written to the database at once when ingesting
+    ingest_batch_size: int = 1000
+
+
+@dataclass(frozen=True)
+class ParserPoolConfig:
+    # extract the text of files in a pool of long-lived worker processes, so
+    # a pathological file cannot hang or exhaust the memory of the indexer
+    enabled: bool = True
+    workers: int = 2
+    # a worker exceeding these limits on a file is killed and replaced
+    timeout_seconds: int = 300
+    max_memory_mb: int = 2048
+    # workers are replaced after this many files to release leaked memory
+    max_tasks_per_worker: int = 100
+
+
+@dataclass(frozen=True)
+class WatchConfig:
+    # use inotify on Linux, poll the directory tree elsewhere or if unavailable
+    use_inotify: bool = True
+    poll_interval_seconds: float = 10
+    # changes are collected until none arrived for this long, so files that
+    # are still being written are ingested once
+    debounce_seconds: float = 2
+    # sources processed between two checks for new changes
+    batch_size: int = 16
 
 
 @dataclass(frozen=True)
@@ -36,6 +198,24 @@ class Config:
     embedding_factory: EmbeddingFactoryConfig = field(
         default_factory=EmbeddingFactoryConfig,
     )
+    embedding_server: EmbeddingServerConfig = field(
+        default_factory=EmbeddingServerConfig,
+    )
+    search: SearchConfig = field(
+        default_factory=SearchConfig,
+    )
+    chunking: ChunkingConfig = field(
+        default_factory=ChunkingConfig,
+    )
+    processing: ProcessingConfig = field(
+        default_factory=ProcessingConfig,
+    )
+    parser_pool: ParserPoolConfig = field(
+        default_factory=ParserPoolConfig,
+    )
+    watch: WatchConfig = field(
+        default_factory=WatchConfig,
+    )
     jira: JiraConfig = field(
         default_factory=JiraConfig,
     )
@@ -55,6 +235,12 @@ def load_config(config_path: str | Path) -> Config:
         log_level_file=raw.get("log_level_file", "DEBUG"),
         database=DatabaseConfig(**raw.get("database", {})),
         embedding_factory=EmbeddingFactoryConfig(**raw.get("embedding_factory", {})),
+        embedding_server=EmbeddingServerConfig(**raw.get("embedding_server", {})),
+        search=SearchConfig(**raw.get("search", {})),
+        chunking=ChunkingConfig(**raw.get("chunking", {})),
+        processing=ProcessingConfig(**raw.get("processing", {})),
+        parser_pool=ParserPoolConfig(**raw.get("parser_pool", {})),
+        watch=WatchConfig(**raw.get("watch", {})),
         jira=JiraConfig(**raw.get("jira", {})),
     )
 
@@ -5,3 +5,13 @@ from .source import Source, SourceRepository
 from .source_tag import SourceTag
 from .tag import Tag, TagRepository
 from .embedding import Embedding, EmbeddingRepository
+from .sparse_posting import SparsePosting, SparsePostingRepository
+from .source_content import SourceContent, SourceContentRepository
+from .processing_journal import (
+    JOURNAL_CLAIMED,
+    JOURNAL_COMPLETED,
+    JOURNAL_FAILED,
+    ProcessingJournal,
+    ProcessingJournalRepository,
+    ProcessingRun,
+)
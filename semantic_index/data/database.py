@@ -54,8 +54,11 @@ def get_session_factory() -> sessionmaker[Session]:
 
 def init_db() -> None:
     from .embedding import Embedding  # noqa: F401
+    from .processing_journal import ProcessingJournal, ProcessingRun  # noqa: F401
     from .source import Source  # noqa: F401
+    from .source_content import SourceContent  # noqa: F401
     from .source_tag import SourceTag  # noqa: F401
+    from .sparse_posting import SparsePosting  # noqa: F401
     from .source_handler import SourceHandler  # noqa: F401
     from .tag import Tag  # noqa: F401
 
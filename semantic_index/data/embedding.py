@@ -1,6 +1,7 @@
-from typing import Sequence, TYPE_CHECKING, cast
+from typing import Iterable, Optional, Sequence, TYPE_CHECKING, cast
 import numpy as np
 from sqlalchemy import (
+    Boolean,
     CursorResult,
     ForeignKey,
     Integer,
@@ -10,11 +11,14 @@ from sqlalchemy import (
     func,
     case,
     select,
+    update,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 from sqlalchemy.types import TypeDecorator
 
 from .database import Base, get_session, SessionFactory
+from .sparse_posting import SparsePosting, insert_postings
+from .types import CompressedText
 from ..api import SearchDateFilter
 
 if TYPE_CHECKING:
@@ -47,6 +51,29 @@ class Embedding(Base):
     source: Mapped["Source"] = relationship("Source", back_populates="embeddings")
     embedding: Mapped[np.ndarray] = mapped_column(NumpyArray, nullable=False)
     chunk_idx: Mapped[int] = mapped_column(Integer, nullable=False)
+    # chunk text persisted at processing time, deferred so that loading the
+    # embedding matrix for a search does not pull the texts along
+    content: Mapped[Optional[str]] = mapped_column(
+        CompressedText, nullable=True, deferred=True
+    )
+    # written while a source is processed and hidden from searches until they
+    # replace the previous embeddings of the source
+    staged: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    # sparse lexical weights (token id to weight) to index along with the
+    # embedding, not a column
+    sparse_weights = None
+
+
+def _delete_for_source(session: Session, source_id: int, staged: bool) -> None:
+    ids = select(Embedding.id).where(
+        Embedding.source_id == source_id, Embedding.staged.is_(staged)
+    )
+    session.execute(delete(SparsePosting).where(SparsePosting.embedding_id.in_(ids)))
+    session.execute(
+        delete(Embedding).where(
+            Embedding.source_id == source_id, Embedding.staged.is_(staged)
+        )
+    )
 
 
 class EmbeddingRepository:
@@ -55,7 +82,7 @@ class EmbeddingRepository:
 
     def get_all(self) -> Sequence[Embedding]:
         with self._session_factory() as session:
-            stmt = select(Embedding)
+            stmt = select(Embedding).where(Embedding.staged.is_(False))
             result = session.execute(stmt).scalars().all()
             session.expunge_all()
         return result
@@ -67,12 +94,84 @@ class EmbeddingRepository:
             session.expunge_all()
         return result
 
+    def get_content(self, embedding_id: int) -> str | None:
+        with self._session_factory() as session:
+            stmt = select(Embedding.content).where(Embedding.id == embedding_id)
+            result = session.execute(stmt).scalar_one_or_none()
+        return result
+
     def create_many(self, embeddings: Sequence[Embedding]) -> None:
         with self._session_factory() as session:
             session.add_all(embeddings)
 
+    def replace_for_source(
+        self,
+        source: "Source",
+        embeddings: Iterable[Embedding],
+        flush_every: int = 256,
+    ) -> None:
+        """
+        Swaps the embeddings of a source and records its processing state. The
+        embeddings may be a lazy iterable (reading and encoding the source as
+        they are consumed): they are written staged in a short transaction per
+        batch of flush_every, so other writers are not locked out meanwhile.
+        Deleting the previous embeddings, unstaging the new ones and updating
+        the source then happen in a single transaction, so a source never ends
+        up without embeddings. If the iterable fails, the staged embeddings
+        are removed and the previous ones kept.
+        """
+        from .source import Source  # Avoid circular import
+
+        with self._session_factory() as session:
+            # left over by an interrupted run
+            _delete_for_source(session, source.id, staged=True)
+
+        try:
+            batch: list[Embedding] = []
+            for embedding in embeddings:
+                embedding.staged = True
+                batch.append(embedding)
+                if len(batch) >= flush_every:
+                    self._write_staged(batch)
+                    batch = []
+            self._write_staged(batch)
+        except BaseException:
+            with self._session_factory() as session:
+                _delete_for_source(session, source.id, staged=True)
+            raise
+
+        with self._session_factory() as session:
+            db_source = session.get(Source, source.id)
+            if db_source is None:
+                raise KeyError(f"Source {source.id} not found")
+            _delete_for_source(session, source.id, staged=False)
+            session.execute(
+                update(Embedding)
+                .where(Embedding.source_id == source.id, Embedding.staged.is_(True))
+                .values(staged=False)
+            )
+            db_source.last_checked = source.last_checked
+            db_source.last_processed = source.last_processed
+            db_source.error = source.error
+            db_source.error_message = source.error_message
+            db_source.error_kind = source.error_kind
+            db_source.attempts = source.attempts
+            db_source.next_retry = source.next_retry
+
+    def _write_staged(self, batch: list[Embedding]) -> None:
+        if not batch:
+            return
+        with self._session_factory() as session:
+            session.add_all(batch)
+            # the sparse weights are indexed once the embeddings have their ids
+            session.flush()
+            insert_postings(session, batch)
+            session.expunge_all()
+
     def delete_by_source_id(self, source_id: int) -> int:
         with self._session_factory() as session:
+            stmt = delete(SparsePosting).where(SparsePosting.source_id == source_id)
+            session.execute(stmt)
             stmt = delete(Embedding).where(Embedding.source_id == source_id)
             result = cast(CursorResult, session.execute(stmt))
         return result.rowcount if result.rowcount else 0
@@ -86,7 +185,7 @@ class EmbeddingRepository:
         from .source_tag import SourceTag  # Avoid circular import
 
         with self._session_factory() as session:
-            stmt = select(Embedding)
+            stmt = select(Embedding).where(Embedding.staged.is_(False))
 
             if (
                 filter.createdate_start
@@ -0,0 +1,127 @@
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, func, select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .database import Base, get_session, SessionFactory
+
+
+JOURNAL_CLAIMED = "claimed"
+JOURNAL_COMPLETED = "completed"
+JOURNAL_FAILED = "failed"
+
+
+class ProcessingRun(Base):
+    __tablename__ = "processing_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    started: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class ProcessingJournal(Base):
+    __tablename__ = "processing_journal"
+    __table_args__ = (Index("idx_processing_journal_run_state", "run_id", "state"),)
+
+    run_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("processing_runs.id"), primary_key=True
+    )
+    source_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("sources.id"), primary_key=True
+    )
+    state: Mapped[str] = mapped_column(String(16), nullable=False)
+    # how often the source was claimed in this run without being finished
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class ProcessingJournalRepository:
+    def __init__(self, session_factory: SessionFactory = get_session):
+        self._session_factory = session_factory
+
+    def get_unfinished_run(self) -> ProcessingRun | None:
+        with self._session_factory() as session:
+            stmt = (
+                select(ProcessingRun)
+                .where(ProcessingRun.finished.is_(None))
+                .order_by(ProcessingRun.id.desc())
+            )
+            result = session.execute(stmt).scalars().first()
+            session.expunge_all()
+        return result
+
+    def start_run(self) -> ProcessingRun:
+        with self._session_factory() as session:
+            run = ProcessingRun(started=datetime.now(), finished=None)
+            session.add(run)
+            session.flush()
+            session.expunge_all()
+        return run
+
+    def finish_run(self, run_id: int) -> None:
+        with self._session_factory() as session:
+            run = session.get(ProcessingRun, run_id)
+            if run is not None:
+                run.finished = datetime.now()
+
+    def claim(self, run_id: int, source_id: int) -> None:
+        self._set_state(run_id, source_id, JOURNAL_CLAIMED)
+
+    def complete(self, run_id: int, source_id: int) -> None:
+        self._set_state(run_id, source_id, JOURNAL_COMPLETED)
+
+    def fail(self, run_id: int, source_id: int) -> None:
+        self._set_state(run_id, source_id, JOURNAL_FAILED)
+
+    def release(self, run_id: int, source_id: int) -> None:
+        """Drops a claim that was given up voluntarily, e.g. on Ctrl+C."""
+        with self._session_factory() as session:
+            entry = session.get(ProcessingJournal, (run_id, source_id))
+            if entry is not None and entry.state == JOURNAL_CLAIMED:
+                session.delete(entry)
+
+    def _set_state(self, run_id: int, source_id: int, state: str) -> None:
+        with self._session_factory() as session:
+            entry = session.get(ProcessingJournal, (run_id, source_id))
+            if entry is None:
+                entry = ProcessingJournal(run_id=run_id, source_id=source_id)
+                entry.attempts = 0
+                session.add(entry)
+            if state == JOURNAL_CLAIMED:
+                # claims in a row that never finished, a source can be processed
+                # again within the same run when it is modified (watch)
+                if entry.state != JOURNAL_CLAIMED:
+                    entry.attempts = 0
+                entry.attempts += 1
+            entry.state = state
+            entry.updated = datetime.now()
+
+    def get_source_ids(self, run_id: int, state: str) -> set[int]:
+        with self._session_factory() as session:
+            stmt = select(ProcessingJournal.source_id).where(
+                ProcessingJournal.run_id == run_id,
+                ProcessingJournal.state == state,
+            )
+            result = set(session.execute(stmt).scalars().all())
+        return result
+
+    def get_interrupted(self, run_id: int) -> Sequence[ProcessingJournal]:
+        """Returns the sources that were claimed but never finished."""
+        with self._session_factory() as session:
+            stmt = select(ProcessingJournal).where(
+                ProcessingJournal.run_id == run_id,
+                ProcessingJournal.state == JOURNAL_CLAIMED,
+            )
+            result = session.execute(stmt).scalars().all()
+            session.expunge_all()
+        return result
+
+    def count_by_state(self, run_id: int) -> dict[str, int]:
+        with self._session_factory() as session:
+            stmt = (
+                select(ProcessingJournal.state, func.count())
+                .where(ProcessingJournal.run_id == run_id)
+                .group_by(ProcessingJournal.state)
+            )
+            result = {state: count for state, count in session.execute(stmt).all()}
+        return result
@@ -1,18 +1,25 @@
 import logging
 from cachetools import cached, TTLCache
 from datetime import datetime, timedelta
-from typing import Optional, TYPE_CHECKING, Sequence
+from typing import Iterator, Optional, TYPE_CHECKING, Sequence
 from sqlalchemy.orm import Mapped, mapped_column, relationship, joinedload, MANYTOMANY
 from sqlalchemy import (
+    BigInteger,
     Boolean,
+    ColumnElement,
     DateTime,
+    Index,
     Integer,
     String,
     Text,
+    delete,
     ForeignKey,
+    insert,
     select,
+    update,
     func,
     extract,
+    or_,
 )
 
 from ..api import HistogramResponse
@@ -31,6 +38,16 @@ logger = logging.getLogger(__name__)
 
 class Source(Base):
     __tablename__ = "sources"
+    __table_args__ = (
+        Index("idx_sources_pending", "error", "last_processed", "obj_modified"),
+        Index("idx_sources_next_retry", "next_retry"),
+        # keyset paging of the pending sources of a handler by scheduling policy
+        Index("idx_sources_handler", "source_handler_id", "id"),
+        Index(
+            "idx_sources_handler_modified", "source_handler_id", "obj_modified", "id"
+        ),
+        Index("idx_sources_handler_size", "source_handler_id", "obj_size", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     source_handler_id: Mapped[int] = mapped_column(
@@ -47,10 +64,16 @@ class Source(Base):
 
     obj_created: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     obj_modified: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    obj_size: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
     last_checked: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     last_processed: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     error: Mapped[bool] = mapped_column(Boolean, default=False)
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error_kind: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_retry: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     title: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
 
     embeddings: Mapped[list["Embedding"]] = relationship(
@@ -58,11 +81,29 @@ class Source(Base):
     )
 
 
+def _insert_values(source: Source) -> dict:
+    return {
+        "source_handler_id": source.source_handler_id,
+        "uri": source.uri,
+        "resolved_to": source.resolved_to,
+        "obj_created": source.obj_created,
+        "obj_modified": source.obj_modified,
+        "obj_size": source.obj_size or 0,
+        "last_checked": source.last_checked,
+        "last_processed": source.last_processed,
+        "error": bool(source.error),
+        "error_message": source.error_message,
+        "error_kind": source.error_kind,
+        "attempts": source.attempts or 0,
+        "next_retry": source.next_retry,
+        "title": source.title,
+    }
+
+
 class SourceRepository:
     def __init__(self, session_factory: SessionFactory = get_session):
         self._session_factory = session_factory
 
-    @cached(cache=TTLCache(maxsize=1, ttl=300))
     def get_all(self) -> Sequence[Source]:
         with self._session_factory() as session:
             stmt = select(Source).order_by(Source.obj_modified.desc())
@@ -70,6 +111,102 @@ class SourceRepository:
             session.expunge_all()
         return result
 
+    @staticmethod
+    def _is_pending() -> ColumnElement[bool]:
+        return Source.error.is_(False) & or_(
+            Source.last_processed.is_(None),
+            Source.obj_modified > Source.last_processed,
+        )
+
+    def count_pending(self, handler_ids: list[int] | None = None) -> int:
+        condition = self._is_pending()
+        if handler_ids is not None:
+            condition = condition & Source.source_handler_id.in_(handler_ids)
+        with self._session_factory() as session:
+            stmt = select(func.count(Source.id)).where(condition)
+            result = session.execute(stmt).scalar_one()
+        return result
+
+    def iter_pending(
+        self,
+        page_size: int = 500,
+        sort_key: ColumnElement | None = None,
+        descending: bool = False,
+        handler_id: int | None = None,
+    ) -> Iterator[Source]:
+        condition = self._is_pending()
+        if handler_id is not None:
+            condition = condition & (Source.source_handler_id == handler_id)
+        return self._iter_where(condition, page_size, sort_key, descending)
+
+    @staticmethod
+    def _is_retry_due(now: datetime) -> ColumnElement[bool]:
+        return Source.error.is_(True) & (Source.next_retry <= now)
+
+    def count_retry_due(self, now: datetime) -> int:
+        with self._session_factory() as session:
+            stmt = select(func.count(Source.id)).where(self._is_retry_due(now))
+            result = session.execute(stmt).scalar_one()
+        return result
+
+    def get_next_retry(self) -> datetime | None:
+        """When the backoff of the first failed source expires, if any."""
+        with self._session_factory() as session:
+            stmt = select(func.min(Source.next_retry)).where(Source.error.is_(True))
+            result = session.execute(stmt).scalar_one()
+        return result
+
+    def iter_retry_due(self, now: datetime, page_size: int = 500) -> Iterator[Source]:
+        return self._iter_where(
+            self._is_retry_due(now), page_size, sort_key=Source.next_retry
+        )
+
+    def iter_processed(self, page_size: int = 500) -> Iterator[Source]:
+        return self._iter_where(Source.last_processed.is_not(None), page_size)
+
+    def _iter_where(
+        self,
+        condition: ColumnElement[bool],
+        page_size: int,
+        sort_key: ColumnElement | None = None,
+        descending: bool = False,
+    ) -> Iterator[Source]:
+        # keyset pagination over (sort_key, id), every page is read in its own
+        # short session so rows can be updated while iterating
+        sort_key = Source.id if sort_key is None else sort_key
+        order = [sort_key, Source.id]
+        if descending:
+            order = [sort_key.desc(), Source.id.desc()]
+        last_key, last_id = None, None
+        while True:
+            with self._session_factory() as session:
+                stmt = select(Source, sort_key).where(condition)
+                if last_id is not None:
+                    if descending:
+                        stmt = stmt.where(
+                            or_(
+                                sort_key < last_key,
+                                (sort_key == last_key) & (Source.id < last_id),
+                            )
+                        )
+                    else:
+                        stmt = stmt.where(
+                            or_(
+                                sort_key > last_key,
+                                (sort_key == last_key) & (Source.id > last_id),
+                            )
+                        )
+                stmt = stmt.order_by(*order).limit(page_size)
+                page = session.execute(stmt).all()
+                session.expunge_all()
+
+            if not page:
+                return
+            for source, _ in page:
+                yield source
+            last_source, last_key = page[-1]
+            last_id = last_source.id
+
     def get_by_id(self, source_id: int) -> Source | None:
         with self._session_factory() as session:
             stmt = (
@@ -96,24 +233,107 @@ class SourceRepository:
             session.expunge_all()
         return result
 
-    def upsert_many(self, sources: Sequence[Source]) -> tuple[int, int]:
-        updated, inserted = 0, 0
+    def upsert_many(
+        self, sources: Sequence[Source], chunk_size: int = 500
+    ) -> tuple[int, int]:
+        """
+        Inserts new sources with their tags and updates the metadata of known
+        ones (by uri) in bulk: one query per chunk_size uris to find the known
+        sources, then batched inserts and updates. Returns the number of
+        updated and inserted sources.
+        """
+        # a source listed twice in the batch is updated with its last listing
+        by_uri = {source.uri: source for source in sources}
+        uris = list(by_uri)
+
+        with self._session_factory() as session:
+            existing: dict[str, tuple[int, bool, datetime]] = {}
+            for i in range(0, len(uris), chunk_size):
+                stmt = select(
+                    Source.uri, Source.id, Source.error, Source.obj_modified
+                ).where(Source.uri.in_(uris[i : i + chunk_size]))
+                for uri, id_, error, obj_modified in session.execute(stmt):
+                    existing[uri] = (id_, error, obj_modified)
+
+            now = datetime.now()
+            updates = []
+            for uri, (id_, error, obj_modified) in existing.items():
+                source = by_uri[uri]
+                values = {
+                    "id": id_,
+                    "obj_created": source.obj_created,
+                    "obj_modified": source.obj_modified,
+                    "obj_size": source.obj_size or 0,
+                    "last_checked": now,
+                    "title": source.title,
+                }
+                if error and obj_modified != source.obj_modified:
+                    # the source changed, so give failed sources another chance
+                    values.update(
+                        error=False,
+                        error_message=None,
+                        error_kind=None,
+                        attempts=0,
+                        next_retry=None,
+                    )
+                updates.append(values)
+            if updates:
+                session.execute(update(Source), updates)
+
+            new_sources = [s for uri, s in by_uri.items() if uri not in existing]
+            if new_sources:
+                stmt = insert(Source).returning(Source.id, sort_by_parameter_order=True)
+                ids = session.execute(
+                    stmt, [_insert_values(source) for source in new_sources]
+                ).scalars()
+                links = []
+                for source, id_ in zip(new_sources, ids):
+                    source.id = id_
+                    links.extend(
+                        {"source_id": id_, "tag_id": tag.id} for tag in source.tags
+                    )
+                if links:
+                    session.execute(insert(SourceTag), links)
+        return len(sources) - len(new_sources), len(new_sources)
+
+    def delete_by_uris(
+        self, uris: Sequence[str], prefixes: Sequence[str] = (), chunk_size: int = 500
+    ) -> int:
+        """
+        Deletes the sources with the given uris or an uri starting with one of
+        the prefixes, along with everything derived from them. Returns the
+        number of deleted sources.
+        """
+        # avoid circular imports
+        from .embedding import Embedding
+        from .processing_journal import ProcessingJournal
+        from .source_content import SourceContent
+        from .sparse_posting import SparsePosting
+
+        conditions = [
+            Source.uri.in_(uris[i : i + chunk_size])
+            for i in range(0, len(uris), chunk_size)
+        ]
+        conditions += [Source.uri.startswith(p, autoescape=True) for p in prefixes]
+
+        deleted = 0
         with self._session_factory() as session:
-            for source in sources:
-                stmt = select(Source).where(Source.uri == source.uri)
-                existing = session.execute(stmt).scalar_one_or_none()
-                if not existing:
-                    source.tags = [session.merge(tag) for tag in source.tags]
-                    session.add(source)
-                    inserted += 1
-                    continue
-
-                existing.obj_created = source.obj_created
-                existing.obj_modified = source.obj_modified
-                existing.last_checked = datetime.now()
-                existing.title = source.title
-                updated += 1
-        return updated, inserted
+            for condition in conditions:
+                stmt = select(Source.id).where(condition)
+                ids = session.execute(stmt).scalars().all()
+                for i in range(0, len(ids), chunk_size):
+                    chunk = ids[i : i + chunk_size]
+                    for table, column in (
+                        (SparsePosting, SparsePosting.source_id),
+                        (Embedding, Embedding.source_id),
+                        (SourceContent, SourceContent.source_id),
+                        (ProcessingJournal, ProcessingJournal.source_id),
+                        (SourceTag, SourceTag.c.source_id),
+                        (Source, Source.id),
+                    ):
+                        session.execute(delete(table).where(column.in_(chunk)))
+                deleted += len(ids)
+        return deleted
 
     def update(self, source: Source) -> None:
         with self._session_factory() as session:
@@ -126,6 +346,9 @@ class SourceRepository:
             db_source.last_processed = source.last_processed
             db_source.error = source.error
             db_source.error_message = source.error_message
+            db_source.error_kind = source.error_kind
+            db_source.attempts = source.attempts
+            db_source.next_retry = source.next_retry
 
     def get_createdate_histogram(self) -> list[HistogramResponse]:
         return self._get_date_histogram(Source.obj_created)
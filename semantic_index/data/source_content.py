@@ -0,0 +1,95 @@
+import hashlib
+from datetime import datetime
+from typing import Iterator
+from sqlalchemy import (
+    DateTime,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    String,
+    delete,
+    select,
+    type_coerce,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .database import Base, get_session, SessionFactory
+from .source import Source
+from .types import CompressedBytes, CompressedText, iter_decompressed
+
+
+def hash_content(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SourceContent(Base):
+    __tablename__ = "source_contents"
+
+    source_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("sources.id"), primary_key=True
+    )
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # obj_modified of the source at the time the text was extracted
+    source_modified: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    extracted: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    content: Mapped[str] = mapped_column(CompressedText, nullable=False)
+
+
+class SourceContentRepository:
+    def __init__(self, session_factory: SessionFactory = get_session):
+        self._session_factory = session_factory
+
+    def get_current(self, source: Source) -> str | None:
+        """Returns the stored text of the source, unless the source changed since."""
+        with self._session_factory() as session:
+            stmt = select(SourceContent.content).where(
+                SourceContent.source_id == source.id,
+                SourceContent.source_modified >= source.obj_modified,
+            )
+            result = session.execute(stmt).scalars().first()
+        return result
+
+    def iter_current(self, source: Source) -> Iterator[str] | None:
+        """Like get_current, but decompresses the stored text incrementally."""
+        with self._session_factory() as session:
+            stmt = select(type_coerce(SourceContent.content, LargeBinary)).where(
+                SourceContent.source_id == source.id,
+                SourceContent.source_modified >= source.obj_modified,
+            )
+            result = session.execute(stmt).scalars().first()
+        if result is None:
+            return None
+        return iter_decompressed(result)
+
+    def put(self, source: Source, content: str) -> str:
+        return self._put(source, content, hash_content(content))
+
+    def put_compressed(
+        self, source: Source, content: CompressedBytes, content_hash: str
+    ) -> str:
+        return self._put(source, content, content_hash)
+
+    def _put(
+        self, source: Source, content: str | CompressedBytes, content_hash: str
+    ) -> str:
+        with self._session_factory() as session:
+            stmt = delete(SourceContent).where(
+                SourceContent.source_id == source.id,
+                SourceContent.content_hash != content_hash,
+            )
+            session.execute(stmt)
+            session.merge(
+                SourceContent(
+                    source_id=source.id,
+                    content_hash=content_hash,
+                    source_modified=source.obj_modified,
+                    extracted=datetime.now(),
+                    content=content,
+                )
+            )
+        return content_hash
+
+    def delete_by_source_id(self, source_id: int) -> None:
+        with self._session_factory() as session:
+            stmt = delete(SourceContent).where(SourceContent.source_id == source_id)
+            session.execute(stmt)
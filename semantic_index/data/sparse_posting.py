@@ -0,0 +1,74 @@
+from typing import Iterable, TYPE_CHECKING
+from sqlalchemy import Float, ForeignKey, Index, Integer, case, func, insert, select
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from .database import Base, get_session, SessionFactory
+
+if TYPE_CHECKING:
+    from .embedding import Embedding
+
+
+class SparsePosting(Base):
+    """
+    Inverted index of the sparse lexical weights of the embeddings: one row
+    per token of a chunk, clustered by token so the postings of the tokens of
+    a query are read together.
+    """
+
+    __tablename__ = "sparse_postings"
+    __table_args__ = (
+        Index("idx_sparse_postings_source_id", "source_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+    token_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    embedding_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("embeddings.id"), primary_key=True
+    )
+    # of the embedding, so the postings of a source are deleted along with it
+    source_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("sources.id"), nullable=False
+    )
+    weight: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+def insert_postings(session: Session, embeddings: Iterable["Embedding"]) -> None:
+    """Adds the sparse weights of flushed embeddings (with ids) to the index."""
+    rows = [
+        {
+            "token_id": token_id,
+            "embedding_id": embedding.id,
+            "source_id": embedding.source_id,
+            "weight": weight,
+        }
+        for embedding in embeddings
+        if embedding.sparse_weights
+        for token_id, weight in embedding.sparse_weights.items()
+    ]
+    if rows:
+        session.execute(insert(SparsePosting), rows)
+
+
+class SparsePostingRepository:
+    def __init__(self, session_factory: SessionFactory = get_session):
+        self._session_factory = session_factory
+
+    def get_scores(self, query_weights: dict[int, float]) -> dict[int, float]:
+        """
+        Dot product of the query's sparse weights with those of every embedding
+        sharing a token with it, by embedding id.
+        """
+        if not query_weights:
+            return {}
+        query_weight = case(query_weights, value=SparsePosting.token_id)
+        with self._session_factory() as session:
+            stmt = (
+                select(
+                    SparsePosting.embedding_id,
+                    func.sum(SparsePosting.weight * query_weight),
+                )
+                .where(SparsePosting.token_id.in_(query_weights))
+                .group_by(SparsePosting.embedding_id)
+            )
+            result = session.execute(stmt).all()
+        return {embedding_id: float(score) for embedding_id, score in result}
@@ -0,0 +1,65 @@
+import codecs
+import hashlib
+import zlib
+from typing import Iterable, Iterator
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+
+class CompressedBytes(bytes):
+    """zlib compressed UTF-8 text, bound to a CompressedText column as is."""
+
+
+class CompressedText(TypeDecorator):
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, CompressedBytes):
+            return bytes(value)
+        if value is not None:
+            return zlib.compress(value.encode("utf-8"))
+        return None
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            return zlib.decompress(value).decode("utf-8")
+        return None
+
+
+class TextCompressor:
+    """Compresses and hashes a text that is written in consecutive pieces."""
+
+    def __init__(self):
+        self._compressor = zlib.compressobj()
+        self._hash = hashlib.sha256()
+        self._parts: list[bytes] = []
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self._hash.update(data)
+        self._parts.append(self._compressor.compress(data))
+
+    def tee_words(self, words: Iterable[tuple[str, str]]) -> Iterator[tuple[str, str]]:
+        """Passes separated words through while writing them with their separators."""
+        for separator, word in words:
+            self.write(separator + word)
+            yield separator, word
+
+    def finish(self) -> tuple[CompressedBytes, str]:
+        """Returns the compressed text and the sha256 of the uncompressed text."""
+        self._parts.append(self._compressor.flush())
+        return CompressedBytes(b"".join(self._parts)), self._hash.hexdigest()
+
+
+def iter_decompressed(data: bytes, block_size: int = 1 << 20) -> Iterator[str]:
+    """Yields the text of a CompressedText value in blocks of decompressed text."""
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(data), block_size):
+        text = decoder.decode(decompressor.decompress(data[start : start + block_size]))
+        if text:
+            yield text
+    text = decoder.decode(decompressor.flush(), final=True)
+    if text:
+        yield text
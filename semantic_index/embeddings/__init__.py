@@ -1,6 +1,41 @@
-from .chunk import Chunk, chunk_text
-from .factory import EmbeddingFactory
+import importlib
+
+from .batcher import MicroBatcher
+from .chunk import (
+    Chunk,
+    ChunkingMode,
+    ChunkingStrategy,
+    chunk_text,
+    iter_chunks,
+    iter_separated_words,
+    iter_structured_chunks,
+    iter_token_chunks,
+    iter_words,
+)
+from .factory import EmbeddingBackend, EmbeddingFactory, create_local_model
 from .model import BaseEmbeddingModel
-from .model_gte import GTEEmbeddingModel
-from .model_remote import RemoteEmbeddingModel
+from .stats import EncoderStats
+from .transport import EMBEDDINGS_MEDIA_TYPE, decode_embeddings, encode_embeddings
 from .utils import get_similarities
+
+# the models import torch, transformers or requests, which takes seconds, so
+# they are imported on first access (PEP 562)
+_LAZY = {
+    "GTEEmbeddingModel": ".model_gte",
+    "OnnxEmbeddingModel": ".model_onnx",
+    "check_parity": ".model_onnx",
+    "EncoderPool": ".model_pool",
+    "NoHealthyHostError": ".model_remote",
+    "RemoteEmbeddingModel": ".model_remote",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        module = importlib.import_module(_LAZY[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY])
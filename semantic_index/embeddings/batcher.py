@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+import numpy as np
+
+from ..config import EmbeddingServerConfig
+from ..metrics import metrics
+from .model import BaseEmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+_queue_depth = metrics.gauge(
+    "semantic_index_server_queue_depth",
+    "Requests waiting to be encoded by the embedding server",
+)
+_batch_texts = metrics.histogram(
+    "semantic_index_server_batch_texts",
+    "Number of texts encoded at once by the embedding server",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+_batch_requests = metrics.histogram(
+    "semantic_index_server_batch_requests",
+    "Number of requests coalesced into a batch by the embedding server",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+_queue_seconds = metrics.histogram(
+    "semantic_index_server_queue_seconds",
+    "Time a request waits before it is encoded",
+)
+
+
+class _Request(NamedTuple):
+    texts: list[str]
+    future: Future
+    queued_at: float
+
+
+class MicroBatcher:
+    """
+    Coalesces the texts of concurrent requests into batches for the model.
+    A batch is encoded once it holds max_batch_texts texts or its first request
+    has waited max_wait_ms, in a dedicated thread, and each request receives
+    the vectors of its texts.
+    """
+
+    def __init__(self, model: BaseEmbeddingModel, server_config: EmbeddingServerConfig):
+        self._model = model
+        self._config = server_config
+        self._queue: queue.Queue[_Request | None] = queue.Queue(
+            server_config.max_queued_requests
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        """
+        Queues the texts, the future resolves to their vectors. Raises
+        queue.Full if max_queued_requests are waiting already.
+        """
+        future: Future = Future()
+        self._queue.put_nowait(_Request(texts, future, time.perf_counter()))
+        _queue_depth.set(self._queue.qsize())
+        return future
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        closed = False
+        while not closed:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            num_texts = len(request.texts)
+            deadline = request.queued_at + self._config.max_wait_ms / 1000
+            while num_texts < self._config.max_batch_texts:
+                timeout = max(0.0, deadline - time.perf_counter())
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closed = True
+                    break
+                batch.append(request)
+                num_texts += len(request.texts)
+            _queue_depth.set(self._queue.qsize())
+            self._encode(batch)
+
+    def _encode(self, batch: list[_Request]) -> None:
+        # requests of clients that went away in the meantime are dropped
+        batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        texts = []
+        for request in batch:
+            _queue_seconds.observe(started - request.queued_at)
+            texts.extend(request.texts)
+        _batch_texts.observe(len(texts))
+        _batch_requests.observe(len(batch))
+
+        try:
+            embeddings = self._model.encode(texts)
+        except Exception as e:
+            logger.error(f"Encoding a batch of {len(texts)} texts failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offsets = np.cumsum([0] + [len(request.texts) for request in batch])
+        for request, start, end in zip(batch, offsets, offsets[1:]):
+            request.future.set_result(embeddings[start:end])
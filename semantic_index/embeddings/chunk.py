@@ -1,11 +1,402 @@
-from typing import NamedTuple, List
+import re
+from collections import deque
+from enum import Enum
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerFast
 
 
 class Chunk(NamedTuple):
     idx: int
     text: str
+    # character span of the chunk in the whitespace normalized text
+    start: int
+    end: int
+
+
+class ChunkingMode(Enum):
+    # chunks of a maximum number of characters, at word boundaries
+    CHARS = "chars"
+    # chunks of a maximum number of tokens of the encoder's tokenizer
+    TOKENS = "tokens"
+
+
+class ChunkingStrategy(Enum):
+    # where chunks end preferably, falling back to weaker boundaries
+    WORD = "word"
+    SENTENCE = "sentence"
+    PARAGRAPH = "paragraph"
+    PAGE = "page"  # also sheets of a workbook
+
+
+# strength of the break between two words
+_WORD, _SENTENCE, _PARAGRAPH, _PAGE = range(4)
+_STRATEGY_LEVELS = {
+    ChunkingStrategy.WORD: _WORD,
+    ChunkingStrategy.SENTENCE: _SENTENCE,
+    ChunkingStrategy.PARAGRAPH: _PARAGRAPH,
+    ChunkingStrategy.PAGE: _PAGE,
+}
+# a chunk ends at a preferred boundary only if it is at least this full
+_MIN_FILL = 0.5
+_BREAKS = re.compile(r"([\n\f])")
+_SENTENCE_END = re.compile(r"[.!?…。！？][\"'”’»)\]]*$")
+
+# words are tokenized in segments (cut at word boundaries, which does not change
+# the tokens) and many segments per tokenizer call
+_TOKENIZE_SEGMENT_WORDS = 256
+_TOKENIZE_BLOCK_WORDS = 32 * _TOKENIZE_SEGMENT_WORDS
+# consumed tokens are dropped from the buffers once there are this many
+_TOKENS_TRIM = 1 << 14
+
+
+def iter_words(pieces: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the words of a text that is given as consecutive pieces (e.g. pages),
+    exactly like "".join(pieces).split() but without joining the pieces. Words
+    spanning piece boundaries are carried over to the next piece.
+    """
+    carry = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        words = (carry + piece).split()
+        carry = ""
+        if words and not piece[-1].isspace():
+            carry = words.pop()
+        yield from words
+    if carry:
+        yield carry
+
+
+def iter_separated_words(
+    pieces: Iterable[str], normalized: bool = False
+) -> Iterator[tuple[str, str]]:
+    """
+    Like iter_words, but yields every word along with the separator that
+    precedes it in the normalized text: "" for the first word, "\\f" after a
+    page or sheet break, "\\n" after a paragraph break (an empty line, or a
+    line break after the end of a sentence) and " " otherwise. Joining them
+    gives a text of the same length as " ".join(words) that keeps the coarse
+    structure of the original. With normalized=True, the pieces are such a
+    normalized text and the separators are taken as they are.
+    """
+    previous: str | None = None  # the last word yielded
+    word = ""  # the current word, possibly continued by the next piece
+    newlines, page_break = 0, False  # breaks since the last word
+
+    def _separator() -> str:
+        if previous is None:
+            return ""
+        if page_break:
+            return "\f"
+        if newlines >= 2 or newlines and (normalized or _ends_sentence(previous)):
+            return "\n"
+        return " "
+
+    for piece in pieces:
+        # words are split line by line, only breaks are handled one by one
+        parts = _BREAKS.split(piece)
+        for i, part in enumerate(parts):
+            if i % 2:
+                if word:
+                    yield _separator(), word
+                    previous, word = word, ""
+                    newlines, page_break = 0, False
+                if part == "\n":
+                    newlines += 1
+                else:
+                    page_break = True
+                continue
+
+            words = part.split()
+            if not words or part[0].isspace():
+                if word:
+                    yield _separator(), word
+                    previous, word = word, ""
+                    newlines, page_break = 0, False
+                if not words:
+                    continue
+            words[0] = word + words[0]
+            # the last word of a piece may continue in the next one
+            word = words.pop() if i == len(parts) - 1 and not part[-1].isspace() else ""
+            if words:
+                yield _separator(), words[0]
+                newlines, page_break = 0, False
+                for other in islice(words, 1, None):
+                    yield " ", other
+                previous = words[-1]
+    if word:
+        yield _separator(), word
+
+
+def _ends_sentence(word: str) -> bool:
+    return _SENTENCE_END.search(word) is not None
+
+
+def _break_level(separator: str, previous: str) -> int:
+    if separator == "\f":
+        return _PAGE
+    if separator == "\n":
+        return _PARAGRAPH
+    if _ends_sentence(previous):
+        return _SENTENCE
+    return _WORD
+
+
+def iter_chunks(
+    words: Iterable[str], size: int = 1536, overlap: bool | float = True
+) -> Iterator[Chunk]:
+    """
+    Streaming variant of chunk_text in word boundary mode. Consumes the words
+    lazily and only keeps the words of the current chunk in memory, yielding
+    the same chunks as chunk_text(" ".join(words), size, overlap=overlap).
+    """
+    separated = ((" ", word) for word in words)
+    return iter_structured_chunks(separated, size, overlap)
+
+
+def iter_structured_chunks(
+    words: Iterable[tuple[str, str]],
+    size: int = 1536,
+    overlap: bool | float = True,
+    strategy: ChunkingStrategy = ChunkingStrategy.WORD,
+) -> Iterator[Chunk]:
+    """
+    Chunks separated words as yielded by iter_separated_words into chunks of up
+    to size characters. Overlap is the fraction of the size that consecutive
+    chunks share (True for half). Beyond the word strategy, a chunk that is at
+    least half full ends at the latest boundary of the strategy, or else of
+    the next weaker one, and the overlap starts at the beginning of a sentence.
+    """
+    assert isinstance(size, int), "size must be an integer"
+    assert size > 0, "size must be greater than 0"
+    ratio = 0.5 if overlap is True else float(overlap)
+    assert 0 <= ratio < 1, "overlap must be at least 0 and less than 1"
+    target_overlap_len = int(size * ratio)
+    min_level = _STRATEGY_LEVELS[strategy]
+
+    words = iter(words)
+    buffer: deque[str] = deque()  # words from the start of the current chunk on
+    # strength of the break before each buffered word
+    levels: deque[int] = deque()
+    previous = ""
+    exhausted = False
+
+    def _fill(count: int) -> bool:
+        nonlocal exhausted, previous
+        while len(buffer) < count and not exhausted:
+            item = next(words, None)
+            if item is None:
+                exhausted = True
+            else:
+                separator, word = item
+                buffer.append(word)
+                if min_level > _WORD:
+                    levels.append(_break_level(separator, previous))
+                else:
+                    levels.append(_WORD)
+                previous = word
+        return len(buffer) >= count
+
+    idx = 0
+    offset = 0  # position of the first buffered word in the normalized text
+    while _fill(1):
+        # build the chunk word by word, the first word is added even if too long
+        count, length = 1, len(buffer[0])
+        while _fill(count + 1):
+            len_if_added = length + 1 + len(buffer[count])
+            if len_if_added > size:
+                break
+            count, length = count + 1, len_if_added
 
-def chunk_text(text: str, size: int = 1536, hard_cut: bool = False, overlap: bool = True) -> list[Chunk]:
+        more = _fill(count + 1)
+        if more and min_level > _WORD:
+            count, length = _cut_at_boundary(buffer, levels, count, size, min_level)
+
+        yield Chunk(idx, " ".join(islice(buffer, count)), offset, offset + length)
+        idx += 1
+        if not more:
+            return
+
+        # start of the next chunk, relative to the start of the current one
+        last = count - 1
+        next_start = count
+        if ratio:
+            # target the overlap length, measured from the end
+            overlap_achieved_len = 0
+            next_start = last
+            for i in range(last, 0, -1):
+                overlap_achieved_len += len(buffer[i]) + 1
+                next_start = i
+                if overlap_achieved_len >= target_overlap_len:
+                    break
+            next_start = max(next_start, 1)
+            if min_level > _WORD:
+                next_start = next(
+                    (i for i in range(next_start, count) if levels[i] >= _SENTENCE),
+                    next_start,
+                )
+
+        for _ in range(next_start):
+            offset += len(buffer.popleft()) + 1
+            levels.popleft()
+
+
+def _cut_at_boundary(
+    buffer: deque[str], levels: deque[int], count: int, size: int, min_level: int
+) -> tuple[int, int]:
+    # number of words and length of the chunk, ending it at the latest boundary
+    # of the strongest level that leaves the chunk at least half full
+    lengths = [0] * (count + 1)
+    for i in range(count):
+        lengths[i + 1] = lengths[i] + len(buffer[i]) + (1 if i else 0)
+    for level in range(min_level, _WORD, -1):
+        for i in range(count, 0, -1):
+            if lengths[i] < size * _MIN_FILL:
+                break
+            if levels[i] >= level:
+                return i, lengths[i]
+    return count, lengths[count]
+
+
+def _token_spans(
+    text: str, offsets: np.ndarray, first: bool
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # sentencepiece tokenizers include the preceding space in the span of a word's
+    # first token and may emit the word start marker as a token of its own, with
+    # a span overlapping the next token at the start of the text
+    is_space = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32) == 32
+    starts, ends = offsets[:, 0].copy(), offsets[:, 1].copy()
+    # the normalized text has single spaces only
+    leading = (starts < ends) & is_space[np.minimum(starts, len(text) - 1)]
+    starts += leading
+    ends[:-1] = np.minimum(ends[:-1], np.maximum(starts[1:], starts[:-1]))
+    ends = np.maximum(ends, starts)
+
+    at_word = is_space[np.maximum(starts - 1, 0)]
+    if first:
+        at_word[starts == 0] = True
+    # a marker and the word that follows it can only be split before the marker
+    at_word[1:] &= starts[1:] != starts[:-1]
+    return starts, ends, at_word
+
+
+def iter_token_chunks(
+    words: Iterable[str],
+    tokenizer: "PreTrainedTokenizerFast",
+    max_tokens: int,
+    overlap_tokens: int = 0,
+) -> Iterator[Chunk]:
+    """
+    Packs the words of a text into chunks of up to max_tokens tokens (excluding
+    special tokens) using the offset mapping of a fast tokenizer. Chunks end at
+    word boundaries where possible and consecutive chunks share up to
+    overlap_tokens tokens. A word longer than max_tokens is cut between tokens,
+    so no text is lost to truncation by the encoder. Spans refer to the
+    whitespace normalized text, like those of chunk_text.
+    """
+    assert isinstance(max_tokens, int), "max_tokens must be an integer"
+    assert max_tokens > 0, "max_tokens must be greater than 0"
+    assert 0 <= overlap_tokens < max_tokens, "overlap_tokens must be < max_tokens"
+
+    backend = tokenizer.backend_tokenizer
+    words = iter(words)
+    text = ""  # normalized text from text_offset on
+    text_offset = 0
+    # per token: span in the normalized text and whether it starts a word
+    starts = np.zeros(0, dtype=np.int64)
+    ends = np.zeros(0, dtype=np.int64)
+    word_starts = np.zeros(0, dtype=bool)
+
+    def _tokenize(block: list[str]) -> None:
+        nonlocal text, starts, ends, word_starts
+        segments = [
+            " ".join(block[i : i + _TOKENIZE_SEGMENT_WORDS])
+            for i in range(0, len(block), _TOKENIZE_SEGMENT_WORDS)
+        ]
+        encodings = backend.encode_batch(segments, add_special_tokens=False)
+
+        # segments are joined by a space, like the words within them
+        first = text_offset + len(text) == 0
+        base = text_offset + len(text) + (0 if first else 1)
+        block_text = " ".join(segments)
+        segment_offsets = np.cumsum([0] + [len(seg) + 1 for seg in segments[:-1]])
+        offsets = np.concatenate(
+            [
+                np.asarray(encoding.offsets, dtype=np.int64).reshape(-1, 2) + offset
+                for encoding, offset in zip(encodings, segment_offsets)
+            ]
+        )
+        block_starts, block_ends, block_word_starts = _token_spans(
+            block_text, offsets, first
+        )
+        text = block_text if first else f"{text} {block_text}"
+        starts = np.concatenate([starts, block_starts + base])
+        ends = np.concatenate([ends, block_ends + base])
+        word_starts = np.concatenate([word_starts, block_word_starts])
+
+    idx = 0
+    current = 0  # first token of the next chunk
+    exhausted = False
+    while True:
+        # one token beyond the chunk tells whether the chunk ends a word
+        while not exhausted and len(starts) - current <= max_tokens:
+            block = list(islice(words, _TOKENIZE_BLOCK_WORDS))
+            if block:
+                _tokenize(block)
+            else:
+                exhausted = True
+
+        remaining = len(starts) - current
+        if remaining <= 0:
+            return
+
+        last = len(starts) - 1
+        if remaining > max_tokens:
+            # the latest word boundary within the budget, else cut the word
+            boundaries = np.flatnonzero(
+                word_starts[current + 1 : current + max_tokens + 1]
+            )
+            last = current + (boundaries[-1] if len(boundaries) else max_tokens - 1)
+
+        start, end = int(starts[current]), int(ends[last])
+        if end > start and text[end - 1 - text_offset] == " ":
+            end -= 1  # cut after a lone word start marker
+        if end > start:  # not only word start markers
+            yield Chunk(idx, text[start - text_offset : end - text_offset], start, end)
+            idx += 1
+        if last == len(starts) - 1 and exhausted:
+            return
+
+        next_start = last + 1
+        if overlap_tokens:
+            # the earliest word start within the overlap, advancing at least one
+            first = max(last + 1 - overlap_tokens, current + 1)
+            boundaries = np.flatnonzero(word_starts[first : last + 1])
+            if len(boundaries):
+                next_start = first + int(boundaries[0])
+        current = int(next_start)
+
+        if current >= _TOKENS_TRIM:
+            text = text[starts[current] - text_offset :]
+            text_offset = int(starts[current])
+            starts, ends = starts[current:], ends[current:]
+            word_starts = word_starts[current:]
+            current = 0
+
+
+def chunk_text(
+    text: str,
+    size: int = 1536,
+    hard_cut: bool = False,
+    overlap: bool = True,
+    compat: bool = True,
+) -> list[Chunk]:
     """
     Splits a text into chunks of a specified maximum size, with options for
     handling word boundaries and overlapping chunks.
@@ -21,123 +412,123 @@ def chunk_text(text: str, size: int = 1536, hard_cut: bool = False, overlap: boo
                  In word boundary mode, the overlap tries to include roughly half
                  the character size of the previous chunk, measured from the end.
                  If False, chunks are consecutive and non-overlapping.
+        compat: Only affects hard_cut mode. If True, the chunks are identical to
+                those of earlier versions, including trailing chunks that are
+                contained in their predecessor. If False, chunking stops at the
+                first chunk reaching the end of the text.
 
     Returns:
-        A list of text chunks.
+        A list of chunks with their character span in the whitespace normalized
+        text, i.e. chunk.text == " ".join(text.split())[chunk.start : chunk.end].
 
     Raises:
         AssertionError: If input types are incorrect or constraints are violated.
     """
-    # 1. Input Validation
     assert isinstance(text, str), "text must be a string"
     assert isinstance(size, int), "size must be an integer"
     assert isinstance(hard_cut, bool), "hard_cut must be a boolean"
     assert isinstance(overlap, bool), "overlap must be a boolean"
     assert size > 0, "size must be greater than 0"
 
-    # 2. Preprocessing - Normalize whitespace
-    text = " ".join(text.split())
+    words = text.split()
+    text = " ".join(words)
     text_length = len(text)
     assert text_length > 0, "text must not be empty"
 
-    # 3. Edge Case: Text is already smaller than chunk size
     if text_length <= size:
-        return [Chunk(0, text)]
-
-    chunks = []
-
-    # 4. Hard Cut Logic (cuts anywhere)
-    if hard_cut:
-        # Determine the step size: full size for no overlap, half size for overlap
-        step = max(1, size // 2 if overlap else size) # Ensure step is at least 1
-
-        for i in range(0, text_length, step):
-            chunk = text[i : i + size].strip()
-            if chunk: # Only add non-empty chunks
-                chunks.append(chunk)
-        # The last chunk might be shorter and is implicitly handled by the slice
-        # Handle potential overlap creating identical last chunks if step is small vs remaining text
-        if len(chunks) > 1 and overlap and chunks[-1] == chunks[-2]:
-             chunks.pop()
-        # Ensure the very end of the text is included if missed by the steps
-        if not text.endswith(chunks[-1][-10:] if chunks else ''): # Heuristic check
-             start_of_last = text.rfind(chunks[-1]) if chunks else 0
-             if start_of_last + len(chunks[-1]) < text_length:
-                  final_chunk_start = max(text_length - size, start_of_last + step) # Try to overlap based on step
-                  final_chunk = text[final_chunk_start:].strip()
-                  if final_chunk and (not chunks or final_chunk != chunks[-1]):
-                      chunks.append(final_chunk)
-
-
-    # 5. Word Boundary Logic
+        return [Chunk(0, text, 0, text_length)]
+
+    if not hard_cut:
+        spans = _word_spans(words, size, overlap)
+    elif compat:
+        spans = _hard_cut_spans_compat(text, size, overlap)
     else:
-        words = text.split()
-        num_words = len(words)
-        current_word_idx = 0
-
-        while current_word_idx < num_words:
-            current_chunk_words = []
-            current_chunk_len = 0
-            last_word_idx_in_chunk = current_word_idx -1 # Initialize before loop
-
-            # Build the chunk word by word
-            for i in range(current_word_idx, num_words):
-                word = words[i]
-                word_len = len(word)
-                # Calculate length if word is added (account for space)
-                len_if_added = current_chunk_len + word_len + (1 if current_chunk_words else 0)
-
-                if len_if_added <= size:
-                    current_chunk_words.append(word)
-                    current_chunk_len = len_if_added
-                    last_word_idx_in_chunk = i
-                else:
-                    # If the very first word is already too long, add it anyway
-                    if i == current_word_idx:
-                         current_chunk_words.append(word)
-                         current_chunk_len = word_len
-                         last_word_idx_in_chunk = i
-                    # Stop adding words to this chunk
-                    break
+        spans = _hard_cut_spans(text, size, overlap)
+    return [
+        Chunk(idx, text[start:end], start, end)
+        for idx, (start, end) in enumerate(spans)
+    ]
 
-            # If no words could be added (e.g., empty input after split?), break outer loop
-            if not current_chunk_words:
-                 break
 
-            # Join the words and add the chunk
-            chunk_str = " ".join(current_chunk_words)
-            chunks.append(chunk_str)
+def _word_spans(words: list[str], size: int, overlap: bool) -> list[tuple[int, int]]:
+    # words are separated by exactly one space in the normalized text, so word
+    # offsets are prefix sums of the word lengths and the length of a run of
+    # words is the distance of its offsets
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    ends = np.cumsum(lengths + 1) - 1
+    starts = ends - lengths
+    # for a chunk starting at each word, the last word that fits
+    lasts = ends.searchsorted(starts + size, "right") - 1
+    # for a chunk ending at each word, the latest word from which on the overlap
+    # (words plus one space each) reaches half the size
+    latests = starts.searchsorted(ends + 1 - size // 2, "right") - 1
+    num_words = len(words)
 
-            # Check if we've processed all words
-            if last_word_idx_in_chunk >= num_words - 1:
-                break
+    spans = []
+    current = 0
+    while True:
+        # the first word is taken even if it is too long
+        last = max(int(lasts[current]), current)
+        spans.append((int(starts[current]), int(ends[last])))
+        if last >= num_words - 1:
+            return spans
+
+        if overlap:
+            # advance at least one word
+            current = max(min(int(latests[last]), last), current + 1)
+        else:
+            current = last + 1
+
+
+def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+    # the normalized text has single spaces, at most one on each side
+    if start < end and text[start] == " ":
+        start += 1
+    if start < end and text[end - 1] == " ":
+        end -= 1
+    return start, end
+
+
+def _hard_cut_spans(text: str, size: int, overlap: bool) -> list[tuple[int, int]]:
+    step = max(1, size // 2 if overlap else size)
+    spans = []
+    for start in range(0, len(text), step):
+        end = min(start + size, len(text))
+        span = _strip_span(text, start, end)
+        if span[0] < span[1]:
+            spans.append(span)
+        if end == len(text):
+            break
+    return spans
+
+
+def _hard_cut_spans_compat(
+    text: str, size: int, overlap: bool
+) -> list[tuple[int, int]]:
+    text_length = len(text)
+    step = max(1, size // 2 if overlap else size)
+
+    spans = []
+    for start in range(0, text_length, step):
+        span = _strip_span(text, start, min(start + size, text_length))
+        if span[0] < span[1]:
+            spans.append(span)
+
+    def _text(span: tuple[int, int]) -> str:
+        return text[span[0] : span[1]]
+
+    # identical last chunks created by a small step are dropped
+    if len(spans) > 1 and overlap and _text(spans[-1]) == _text(spans[-2]):
+        spans.pop()
 
-            # Determine the start of the next chunk
-            if overlap:
-                # Target an overlap of roughly half the size
-                target_overlap_len = size // 2
-                overlap_achieved_len = 0
-                next_start_word_idx = last_word_idx_in_chunk # Default to minimal overlap
-
-                # Iterate backwards from the end of the current chunk
-                for i in range(last_word_idx_in_chunk, current_word_idx, -1):
-                    word = words[i]
-                    overlap_achieved_len += len(word) + 1 # Add 1 for space
-                    # If the accumulated overlap length reaches the target,
-                    # the *next* word (i) is where the next chunk should start
-                    if overlap_achieved_len >= target_overlap_len:
-                        next_start_word_idx = i
-                        break
-                    # If we went too far back and included the starting word,
-                    # we must advance by at least one. Set next start to word after current start.
-                    next_start_word_idx = i
-
-
-                # Ensure we always advance by at least one word to prevent infinite loops
-                current_word_idx = max(next_start_word_idx, current_word_idx + 1)
-
-            else: # No overlap, start next chunk after the last word of the current one
-                current_word_idx = last_word_idx_in_chunk + 1
-
-    # Filter out any potential empty strings again just in case
-    return [Chunk(idx, chunk) for idx, chunk in enumerate(chunks) if chunk]
\ No newline at end of file
+    # make sure the end of the text is included, based on the last occurrence
+    # of the last chunk's text like the original heuristic
+    last = _text(spans[-1])
+    if not text.endswith(last[-10:]):
+        start_of_last = text.rfind(last)
+        if start_of_last + len(last) < text_length:
+            final_start = max(text_length - size, start_of_last + step)
+            final = _strip_span(text, final_start, text_length)
+            if final[0] < final[1] and _text(final) != last:
+                spans.append(final)
+    return spans
@@ -1,34 +1,223 @@
-import numpy as np
+import enum
+import logging
+from typing import TYPE_CHECKING, Iterable, Iterator
 
-from ..config import config
+from ..config import ChunkingConfig, config
 from ..data import Embedding, Source
-from .chunk import Chunk, chunk_text
-from .model import BaseEmbeddingModel
-from .model_gte import GTEEmbeddingModel
-from .model_remote import RemoteEmbeddingModel
+from ..metrics import metrics
+from .chunk import (
+    Chunk,
+    ChunkingMode,
+    ChunkingStrategy,
+    iter_separated_words,
+    iter_structured_chunks,
+    iter_token_chunks,
+)
+from .model import BaseEmbeddingModel, load_tokenizer
+from .stats import EncoderStats
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerFast
+
+logger = logging.getLogger(__name__)
+
+_chunks_per_source = metrics.histogram(
+    "semantic_index_chunks_per_source",
+    "Number of chunks a source is split into",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+_encode_seconds = metrics.histogram(
+    "semantic_index_encode_seconds",
+    "Time to encode a window of chunks",
+)
+_encoded_texts = metrics.counter(
+    "semantic_index_encoded_texts_total",
+    "Number of texts encoded",
+)
+_encoded_chars = metrics.counter(
+    "semantic_index_encoded_chars_total",
+    "Number of characters encoded",
+)
+
+# number of chunks that are encoded at once when processing a stream of words
+_STREAM_WINDOW = 256
+
+
+class EmbeddingBackend(enum.Enum):
+    AUTO = "auto"
+    TORCH = "torch"
+    ONNX = "onnx"
+
+
+def create_local_model(threads: int | None = None) -> BaseEmbeddingModel:
+    """
+    The embedding model of the configured backend, run in this process with
+    the given number of threads per inference (by default as configured).
+    """
+    # the backends import torch and transformers, only when a model is needed
+    import torch
+
+    from .model_gte import GTEEmbeddingModel
+    from .model_onnx import OnnxEmbeddingModel
+
+    backend = EmbeddingBackend(config.embedding_factory.backend)
+    if backend == EmbeddingBackend.AUTO:
+
+        if torch.cuda.is_available():
+            return GTEEmbeddingModel()
+        try:
+            return OnnxEmbeddingModel(threads=threads)
+        except (ImportError, ValueError) as e:
+            # ValueError: the exported model failed the parity check
+            logger.warning(f"{e}, falling back to torch on the CPU")
+            return GTEEmbeddingModel()
+    if backend == EmbeddingBackend.ONNX:
+        return OnnxEmbeddingModel(threads=threads)
+    return GTEEmbeddingModel()
 
 
 class EmbeddingFactory:
     def __init__(self):
         self._model = None
+        self._tokenizer = None
+        self._token_budgets: dict[int, int] = {}
 
     @property
     def model(self) -> BaseEmbeddingModel:
         if self._model is None:
-            self._model = self.create_embedding_model()
+            model = self.create_embedding_model()
+            if config.embedding_factory.autotune:
+                model.autotune(config.embedding_factory.autotune_candidates)
+                model.stats.reset()
+            if config.embedding_factory.sparse and not model.supports_sparse:
+                logger.warning(
+                    f"{type(model).__name__} has no sparse weights, "
+                    "only dense embeddings are stored"
+                )
+            self._model = model
         return self._model
 
+    @property
+    def sparse(self) -> bool:
+        """Whether sparse weights are stored along with the embeddings."""
+        return config.embedding_factory.sparse and self.model.supports_sparse
+
     def create_embedding_model(self) -> BaseEmbeddingModel:
         if config.embedding_factory.process_remote:
+            from .model_remote import RemoteEmbeddingModel
+
             return RemoteEmbeddingModel()
-        return GTEEmbeddingModel()
+        if config.embedding_factory.pool_workers > 1:
+            from .model_pool import EncoderPool
+
+            return EncoderPool(config.embedding_factory.pool_workers)
+        return create_local_model()
+
+    def warmup(self) -> None:
+        """Loads the model and runs it once, see BaseEmbeddingModel.warmup."""
+        try:
+            self.model.warmup()
+        except Exception as e:
+            # e.g. the remote encoder is not up yet, the first request loads it
+            logger.warning(f"Embedding model warmup failed: {e}")
+        self.model.stats.reset()
+
+    def stats(self) -> EncoderStats:
+        """
+        What the model spent encoding since it was loaded (excluding warmup
+        and autotune), empty if no model is loaded.
+        """
+        if self._model is None:
+            return EncoderStats()
+        return self._model.stats
+
+    @property
+    def tokenizer(self) -> "PreTrainedTokenizerFast":
+        if self._tokenizer is None:
+            tokenizer = getattr(self._model, "tokenizer", None)
+            if tokenizer is None:
+                # e.g. encoding remotely, only the tokenizer is loaded locally
+                tokenizer = load_tokenizer()
+            assert tokenizer.is_fast, "Token chunking requires a fast tokenizer"
+            self._tokenizer = tokenizer
+        return self._tokenizer
 
-    def process(self, content: str, source: Source) -> list[Embedding]:
+    def get_token_budget(self, max_tokens: int) -> int:
+        """Maximum number of tokens per chunk, excluding special tokens."""
+        if max_tokens not in self._token_budgets:
+            budget = max_tokens
+            max_length = self.model.max_length
+            if max_length is not None and max_length < max_tokens:
+                logger.warning(
+                    f"Chunking max_tokens {max_tokens} exceeds the model's maximum "
+                    f"length, using {max_length}"
+                )
+                budget = max_length
+            budget -= self.tokenizer.num_special_tokens_to_add()
+            self._token_budgets[max_tokens] = budget
+        return self._token_budgets[max_tokens]
+
+    def chunk_words(
+        self,
+        words: Iterable[tuple[str, str]],
+        chunking: ChunkingConfig | None = None,
+    ) -> Iterator[Chunk]:
+        """
+        Chunks the separated words of a source (see iter_separated_words) with
+        the given settings, by default the configured ones.
+        """
+        cfg = chunking or config.chunking
+        if ChunkingMode(cfg.mode) == ChunkingMode.TOKENS:
+            budget = self.get_token_budget(cfg.max_tokens)
+            overlap = min(cfg.overlap_tokens, budget - 1)
+            plain_words = (word for _, word in words)
+            return iter_token_chunks(plain_words, self.tokenizer, budget, overlap)
+        strategy = ChunkingStrategy(cfg.strategy)
+        return iter_structured_chunks(words, cfg.size, cfg.overlap, strategy)
+
+    def process(
+        self, content: str, source: Source, chunking: ChunkingConfig | None = None
+    ) -> list[Embedding]:
+        words = iter_separated_words([content], normalized=True)
+        return list(self.process_stream(words, source, chunking))
+
+    def process_stream(
+        self,
+        words: Iterable[tuple[str, str]],
+        source: Source,
+        chunking: ChunkingConfig | None = None,
+    ) -> Iterator[Embedding]:
+        """
+        Chunks and encodes the words of a source as they arrive, so that only a
+        window of chunks is held in memory regardless of the size of the source.
+        """
         assert source.id is not None, "Source ID must be set before processing."
 
-        chunks: list[Chunk] = chunk_text(content)
+        num_chunks = 0
+        window: list[Chunk] = []
+        for chunk in self.chunk_words(words, chunking):
+            window.append(chunk)
+            num_chunks += 1
+            if len(window) >= _STREAM_WINDOW:
+                yield from self._encode_chunks(window, source)
+                window = []
+        if window:
+            yield from self._encode_chunks(window, source)
+
+        if not num_chunks:
+            raise ValueError(f"Source {source.uri} is empty")
+        _chunks_per_source.observe(num_chunks)
+
+    def _encode_chunks(self, chunks: list[Chunk], source: Source) -> list[Embedding]:
         texts: list[str] = [chunk.text for chunk in chunks]
-        embeddings_array: np.ndarray = self.model.encode(texts)
+        sparse_weights: list[dict[int, float] | None] = [None] * len(texts)
+        with _encode_seconds.time():
+            if self.sparse:
+                embeddings_array, sparse_weights = self.model.encode_sparse(texts)
+            else:
+                embeddings_array = self.model.encode(texts)
+        _encoded_texts.inc(len(texts))
+        _encoded_chars.inc(sum(len(text) for text in texts))
 
         return [
             Embedding(
@@ -36,6 +225,10 @@ class EmbeddingFactory:
                 source_id=source.id,
                 embedding=embedding,
                 chunk_idx=chunk.idx,
+                content=chunk.text,
+                sparse_weights=weights,
+            )
+            for chunk, embedding, weights in zip(
+                chunks, embeddings_array, sparse_weights
             )
-            for chunk, embedding in zip(chunks, embeddings_array)
         ]
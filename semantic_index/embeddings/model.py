@@ -1,36 +1,269 @@
 import abc
+import logging
 import math
-from typing import Sequence
+import random
+import string
+import time
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
 import numpy as np
 from tqdm import tqdm
 
 from ..config import config
+from ..metrics import metrics
+from .stats import EncoderStats
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerFast
+
+logger = logging.getLogger(__name__)
+
+_encoded_tokens = metrics.counter(
+    "semantic_index_encoded_tokens_total",
+    "Number of tokens (excluding padding) run through the encoder",
+)
+_padded_tokens = metrics.counter(
+    "semantic_index_padded_tokens_total",
+    "Number of tokens (including padding) run through the encoder",
+)
+_padding_efficiency = metrics.histogram(
+    "semantic_index_batch_padding_efficiency",
+    "Fraction of the tokens of a batch that are not padding",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0),
+)
+
+
+_batch_token_budget = metrics.gauge(
+    "semantic_index_batch_token_budget",
+    "Maximum number of tokens (including padding) per batch, 0 if batched by count",
+)
+_warmup_seconds = metrics.gauge(
+    "semantic_index_model_warmup_seconds",
+    "Time the warmup of the embedding model took",
+)
+_autotune_throughput = metrics.gauge(
+    "semantic_index_autotune_tokens_per_second",
+    "Tokens (excluding padding) encoded per second while autotuning, by budget",
+    ["budget"],
+)
+
+# rough estimate for models that do not tokenize locally
+_CHARS_PER_TOKEN = 4
+# texts encoded per autotune candidate, of lengths up to the maximum length
+_AUTOTUNE_TEXTS = 128
+# warmup texts are about as long as chunks, not as the maximum length
+_WARMUP_MAX_TOKENS = 512
+
+
+def model_location() -> tuple[str, dict]:
+    """
+    The name or directory from_pretrained loads the model and its tokenizer
+    from, and its keyword arguments.
+    """
+    cfg = config.embedding_factory
+    if cfg.model_path:
+        return cfg.model_path, {"local_files_only": True}
+    return cfg.model_name, {"local_files_only": cfg.offline}
+
+
+def load_tokenizer() -> "PreTrainedTokenizerFast":
+    from transformers import AutoTokenizer
+
+    location, kwargs = model_location()
+    return AutoTokenizer.from_pretrained(location, **kwargs)
 
 
 class BaseEmbeddingModel(abc.ABC):
+    # maximum number of tokens per text (including special tokens), if known
+    max_length: int | None = None
+    # whether encode_sparse is available
+    supports_sparse: bool = False
+
+    def __init__(self):
+        self.max_batch_tokens = config.embedding_factory.max_batch_tokens
+        _batch_token_budget.set(self.max_batch_tokens)
+        self.stats = EncoderStats()
+
     def encode(
         self,
         texts: str | Sequence[str],
         show_progress: bool = False,
+        sort_by_length: bool | None = None,
     ) -> np.ndarray:
         if isinstance(texts, str):
             texts = [texts]
+        started = time.perf_counter()
+        order, batches = self._plan_batches(texts, sort_by_length)
 
-        batch_size = config.embedding_factory.batch_size
-        num_texts = len(texts)
-        num_batches = math.ceil(num_texts / batch_size)
+        results = self._encode_batches(
+            [texts[j] for j in indices] for indices in batches
+        )
+        if show_progress:
+            results = tqdm(results, total=len(batches), desc="Encoding")
+        embeddings = list(results)
+
+        stacked = np.vstack(embeddings)
+        result = np.empty_like(stacked)
+        result[order] = stacked
+        self.stats.observe_encode(len(texts), time.perf_counter() - started)
+        return result
+
+    def encode_sparse(
+        self, texts: str | Sequence[str], show_progress: bool = False
+    ) -> tuple[np.ndarray, list[dict[int, float]]]:
+        """
+        Like encode, but also returns the sparse lexical weights of each text
+        (token id to weight) from the same forward pass, if the model
+        supports_sparse.
+        """
+        if not self.supports_sparse:
+            raise NotImplementedError(f"{type(self).__name__} has no sparse weights")
+        if isinstance(texts, str):
+            texts = [texts]
+        started = time.perf_counter()
+        order, batches = self._plan_batches(texts, None)
 
-        iterator = range(0, num_texts, batch_size)
+        results = map(
+            self._encode_batch_sparse, ([texts[j] for j in i] for i in batches)
+        )
         if show_progress:
-            iterator = tqdm(iterator, total=num_batches, desc="Encoding")
+            results = tqdm(results, total=len(batches), desc="Encoding")
+        dense, sparse = [], []
+        for batch_dense, batch_sparse in results:
+            dense.append(batch_dense)
+            sparse.extend(batch_sparse)
 
-        embeddings = []
-        for i in iterator:
-            batch = texts[i : i + batch_size]
-            embeddings.append(self._encode_batch(list(batch)))
+        stacked = np.vstack(dense)
+        result = np.empty_like(stacked)
+        result[order] = stacked
+        self.stats.observe_encode(len(texts), time.perf_counter() - started)
+        return result, [sparse[position] for position in np.argsort(order)]
 
-        return np.vstack(embeddings)
+    def _plan_batches(
+        self, texts: Sequence[str], sort_by_length: bool | None
+    ) -> tuple[np.ndarray, list[np.ndarray]]:
+        """The order the texts are encoded in and the indices of each batch."""
+        if sort_by_length is None:
+            sort_by_length = config.embedding_factory.sort_by_length
+
+        num_texts = len(texts)
+        order = np.arange(num_texts)
+        lengths = None
+        if num_texts > 1 and (sort_by_length or self.max_batch_tokens > 0):
+            lengths = np.asarray(self._text_lengths(texts))
+        # batches are padded to their longest text, so texts of similar length
+        # are batched together (longest first) and put back in order after
+        if sort_by_length and lengths is not None:
+            order = np.argsort(-lengths, kind="stable")
+
+        if self.max_batch_tokens > 0 and lengths is not None:
+            return order, _split_by_tokens(order, lengths, self.max_batch_tokens)
+        batch_size = config.embedding_factory.batch_size
+        return order, [
+            order[i : i + batch_size] for i in range(0, num_texts, batch_size)
+        ]
+
+    def _text_lengths(self, texts: Sequence[str]) -> Sequence[int]:
+        """Length of the texts in tokens as padded by the model, estimated here."""
+        return [math.ceil(len(text) / _CHARS_PER_TOKEN) + 2 for text in texts]
 
     @abc.abstractmethod
     def _encode_batch(self, batch: list[str]) -> np.ndarray:
         pass
+
+    def _encode_batch_sparse(
+        self, batch: list[str]
+    ) -> tuple[np.ndarray, list[dict[int, float]]]:
+        raise NotImplementedError(f"{type(self).__name__} has no sparse weights")
+
+    def _observe_tokens(self, num_tokens: int, num_padded: int) -> None:
+        """Records the tokens of a batch, with and without padding."""
+        _encoded_tokens.inc(num_tokens)
+        _padded_tokens.inc(num_padded)
+        _padding_efficiency.observe(num_tokens / num_padded)
+        self.stats.observe_batch(num_tokens, num_padded)
+
+    def _encode_batches(self, batches: Iterable[list[str]]) -> Iterator[np.ndarray]:
+        """Encodes the batches in order, models may encode several at once."""
+        return map(self._encode_batch, batches)
+
+    def warmup(self) -> float:
+        """
+        Encodes a query and a batch of texts of lengths up to a chunk once, so
+        the first real requests do not pay for memory allocation, kernel
+        selection or compilation. Returns the time it took.
+        """
+        started = time.perf_counter()
+        texts = _autotune_texts(min(self.max_length or 512, _WARMUP_MAX_TOKENS))
+        self.encode(texts[0])
+        self.encode(texts)
+        seconds = time.perf_counter() - started
+        _warmup_seconds.set(seconds)
+        logger.info(f"Embedding model warmed up in {seconds:.2f} seconds")
+        return seconds
+
+    def autotune(self, candidates: Sequence[int]) -> int:
+        """
+        Measures the encoding throughput with each of the token budgets per
+        batch on this machine and keeps the fastest. A budget that fails, e.g.
+        running out of GPU memory, ends the search.
+        """
+        texts = _autotune_texts(self.max_length or 512)
+        num_tokens = int(np.sum(self._text_lengths(texts)))
+        # the first batches are slow (allocations, kernel selection)
+        self.max_batch_tokens = min(candidates)
+        self.encode(texts[: _AUTOTUNE_TEXTS // 8])
+
+        best_budget, best_throughput = self.max_batch_tokens, 0.0
+        for budget in sorted(candidates):
+            self.max_batch_tokens = budget
+            try:
+                started = time.perf_counter()
+                self.encode(texts, sort_by_length=True)
+                throughput = num_tokens / (time.perf_counter() - started)
+            except RuntimeError as e:
+                logger.warning(f"Autotune: a budget of {budget} tokens failed: {e}")
+                break
+            _autotune_throughput.set(throughput, budget=str(budget))
+            logger.info(
+                f"Autotune: {budget} tokens per batch, {throughput:.0f} tokens/s"
+            )
+            if throughput > best_throughput:
+                best_budget, best_throughput = budget, throughput
+
+        self.max_batch_tokens = best_budget
+        _batch_token_budget.set(best_budget)
+        logger.info(f"Autotune: using batches of up to {best_budget} tokens")
+        return best_budget
+
+
+def _split_by_tokens(
+    order: np.ndarray, lengths: np.ndarray, max_tokens: int
+) -> list[np.ndarray]:
+    # consecutive texts as long as the padded batch stays within the budget, a
+    # text longer than the budget is a batch of its own
+    batches = []
+    start, longest = 0, 0
+    for i, index in enumerate(order):
+        longest_if_added = max(longest, int(lengths[index]))
+        if i > start and (i - start + 1) * longest_if_added > max_tokens:
+            batches.append(order[start:i])
+            start, longest_if_added = i, int(lengths[index])
+        longest = longest_if_added
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
+
+
+def _autotune_texts(max_length: int) -> list[str]:
+    # random words of lengths spread up to about the maximum length in tokens
+    rng = random.Random(0)
+    texts = []
+    for i in range(_AUTOTUNE_TEXTS):
+        num_words = max(1, (i + 1) * max_length // _AUTOTUNE_TEXTS // 2)
+        texts.append(
+            " ".join(
+                "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+                for _ in range(num_words)
+            )
+        )
+    return texts
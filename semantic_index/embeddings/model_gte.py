@@ -1,52 +1,140 @@
 import logging
+import os
+from typing import Sequence
 import numpy as np
 import torch
-from transformers import (
-    AutoModelForTokenClassification,
-    AutoTokenizer,
-    XLMRobertaTokenizerFast,
-)
+from transformers import AutoModelForTokenClassification, XLMRobertaTokenizerFast
 
-from .model import BaseEmbeddingModel
+from ..config import config
+from .model import BaseEmbeddingModel, load_tokenizer, model_location
 
 logger = logging.getLogger(__name__)
 
 
+def load_gte_model(dtype: torch.dtype, **kwargs) -> torch.nn.Module:
+    location, location_kwargs = model_location()
+    return AutoModelForTokenClassification.from_pretrained(
+        location,
+        trust_remote_code=True,
+        dtype=dtype,
+        **location_kwargs,
+        **kwargs,
+    )
+
+
+def compile_model(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Compiles the model for variable batch sizes and lengths. The kernels are
+    compiled on the first batches and cached in compile_cache_dir, where later
+    processes reuse them. Parts that fail to compile run uncompiled.
+    """
+    import torch._dynamo
+
+    cache_dir = os.path.abspath(config.embedding_factory.compile_cache_dir)
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = cache_dir
+    torch._dynamo.config.suppress_errors = True
+    return torch.compile(model, dynamic=True)
+
+
+def count_tokens(
+    tokenizer: XLMRobertaTokenizerFast, texts: Sequence[str], max_length: int | None
+) -> list[int]:
+    """Number of tokens of each text as encoded, including special tokens."""
+    tokens = tokenizer(
+        list(texts),
+        truncation=True,
+        max_length=max_length,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return [len(ids) for ids in tokens.input_ids]
+
+
 class GTEEmbeddingModel(BaseEmbeddingModel):
+    supports_sparse = True
+
     def __init__(self):
         super().__init__()
 
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"GTE model using device: {self.device}")
-        model_name = "Alibaba-NLP/gte-multilingual-base"
-        self.tokenizer: XLMRobertaTokenizerFast = AutoTokenizer.from_pretrained(
-            model_name
-        )
-        self.model: torch.nn.Module = AutoModelForTokenClassification.from_pretrained(
-            model_name,
-            trust_remote_code=True,
-            dtype=torch.float16,
-        )
+        # half precision matmuls are only fast on GPUs
+        dtype = torch.float16 if self.device == "cuda" else torch.float32
+        logger.info(f"GTE model using device: {self.device} ({dtype})")
+        self.tokenizer: XLMRobertaTokenizerFast = load_tokenizer()  # type: ignore
+        # special tokens (cls, eos, pad, unk) have no lexical weight
+        self._special_ids = np.array(self.tokenizer.all_special_ids)
+        self.model: torch.nn.Module = load_gte_model(dtype)
         self.model.to(self.device).eval()
+        self.max_length = int(self.model.config.max_position_embeddings)  # type: ignore
+        if config.embedding_factory.compile:
+            self.model = compile_model(self.model)
         logger.info("GTE model loaded")
 
+    def _text_lengths(self, texts: Sequence[str]) -> Sequence[int]:
+        with self.stats.time("tokenize"):
+            return count_tokens(self.tokenizer, texts, self.max_length)
+
     @torch.no_grad()
     def _encode_batch(self, batch: list[str]) -> np.ndarray:
-        tokens = self.tokenizer(
-            batch,
-            padding=True,
-            truncation=True,
-            return_tensors="pt",
-            max_length=self.model.config.max_position_embeddings, # type: ignore
+        _, model_out = self._forward(batch)
+        return self._dense(model_out)
+
+    @torch.no_grad()
+    def _encode_batch_sparse(
+        self, batch: list[str]
+    ) -> tuple[np.ndarray, list[dict[int, float]]]:
+        tokens, model_out = self._forward(batch)
+        # the token classification head scores each token's lexical weight
+        weights = torch.relu(model_out.logits).squeeze(-1).float()
+        with self.stats.time("transfer"):
+            weights = weights.cpu().numpy()
+        input_ids = tokens.input_ids.numpy()
+        keep = (
+            tokens.attention_mask.numpy().astype(bool)
+            & (weights > config.embedding_factory.sparse_min_weight)
+            & ~np.isin(input_ids, self._special_ids)
         )
 
-        model_out = self.model(
-            input_ids=tokens.input_ids.to(self.device),
-            attention_mask=tokens.attention_mask.to(self.device),
-            return_dict=True,
+        sparse = []
+        for ids, text_weights, text_keep in zip(input_ids, weights, keep):
+            ids, text_weights = ids[text_keep], text_weights[text_keep]
+            # a token occurring several times keeps its highest weight
+            ascending = np.argsort(text_weights, kind="stable")
+            sparse.append(
+                dict(zip(ids[ascending].tolist(), text_weights[ascending].tolist()))
+            )
+        return self._dense(model_out), sparse
+
+    def _forward(self, batch: list[str]):
+        with self.stats.time("tokenize"):
+            tokens = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                return_tensors="pt",
+                max_length=self.max_length,
+            )
+
+        self._observe_tokens(
+            int(tokens.attention_mask.sum()), tokens.attention_mask.numel()
         )
+        with self.stats.time("transfer"):
+            input_ids = tokens.input_ids.to(self.device)
+            attention_mask = tokens.attention_mask.to(self.device)
+        with self.stats.time("forward"):
+            model_out = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                return_dict=True,
+            )
+            if self.device == "cuda":
+                # kernels run asynchronously, wait so they count as forward
+                torch.cuda.synchronize()
+        return tokens, model_out
 
+    def _dense(self, model_out) -> np.ndarray:
         emb = model_out.last_hidden_state[:, 0]
         emb = torch.nn.functional.normalize(emb, dim=-1)
-        emb = emb.cpu().numpy()
+        with self.stats.time("transfer"):
+            emb = emb.cpu().numpy()
         return emb
@@ -0,0 +1,197 @@
+import logging
+import os
+from typing import Sequence
+import numpy as np
+import torch
+from transformers import AutoConfig, XLMRobertaTokenizerFast
+
+from ..config import config
+from .model import BaseEmbeddingModel, load_tokenizer, model_location
+from .model_gte import GTEEmbeddingModel, load_gte_model
+
+logger = logging.getLogger(__name__)
+
+_OPSET_VERSION = 17
+# texts compared with the torch model after an export
+_PARITY_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Der Vertrag wurde am 3. März 2021 von beiden Parteien unterzeichnet.",
+    "Les résultats trimestriels dépassent les prévisions des analystes.",
+    "服务器在凌晨两点重新启动，所有服务均已恢复正常。",
+    "Ticket PROJ-1234: login fails with HTTP 500 after the password reset.",
+    " ".join(["A longer text to cover sequences of a few hundred tokens."] * 40),
+]
+
+
+class _ClsEmbedding(torch.nn.Module):
+    # the exported graph includes pooling and normalization
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        out = self.model(
+            input_ids=input_ids, attention_mask=attention_mask, return_dict=True
+        )
+        return torch.nn.functional.normalize(out.last_hidden_state[:, 0], dim=-1)
+
+
+def cosine_similarities(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    reference = reference.astype(np.float32)
+    candidate = candidate.astype(np.float32)
+    return np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+
+
+def check_parity(
+    reference: BaseEmbeddingModel,
+    candidate: BaseEmbeddingModel,
+    texts: Sequence[str],
+    min_similarity: float,
+) -> float:
+    """
+    Encodes the texts with both models and raises if the vectors of any text
+    are less similar than min_similarity. Returns the lowest similarity.
+    """
+    similarities = cosine_similarities(reference.encode(texts), candidate.encode(texts))
+    lowest = float(similarities.min())
+    logger.info(
+        f"Parity of {type(candidate).__name__}: cosine similarity min {lowest:.5f}, "
+        f"mean {float(similarities.mean()):.5f} over {len(texts)} texts"
+    )
+    if lowest < min_similarity:
+        raise ValueError(
+            f"Embeddings deviate from the reference model (cosine similarity "
+            f"{lowest:.5f} < {min_similarity})"
+        )
+    return lowest
+
+
+class _TorchReference(GTEEmbeddingModel):
+    # the float32 model the ONNX graph was exported from, on the CPU
+    def __init__(self, tokenizer: XLMRobertaTokenizerFast, model: torch.nn.Module):
+        BaseEmbeddingModel.__init__(self)
+        self.device = "cpu"
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_length = int(model.config.max_position_embeddings)  # type: ignore
+
+
+class OnnxEmbeddingModel(GTEEmbeddingModel):
+    """
+    The GTE model run with ONNX Runtime on the CPU, in float32 or with int8
+    weights. The model is exported (and quantized) on first use into
+    embedding_factory.onnx_dir and checked against the torch model.
+    """
+
+    # the exported graph only outputs the dense vector
+    supports_sparse = False
+
+    def __init__(self, quantize: bool | None = None, threads: int | None = None):
+        BaseEmbeddingModel.__init__(self)
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend requires the onnxruntime and onnx packages"
+            ) from e
+
+        cfg = config.embedding_factory
+        if quantize is None:
+            quantize = cfg.onnx_quantize
+        if threads is None:
+            threads = cfg.onnx_threads
+        self.device = "cpu"
+        self.tokenizer = load_tokenizer()
+        location, location_kwargs = model_location()
+        model_config = AutoConfig.from_pretrained(
+            location, trust_remote_code=True, **location_kwargs
+        )
+        self.max_length = int(model_config.max_position_embeddings)
+
+        model_dir = os.path.join(cfg.onnx_dir, cfg.model_name.replace("/", "--"))
+        path = os.path.join(model_dir, "model.int8.onnx" if quantize else "model.onnx")
+        reference = None
+        if not os.path.exists(path):
+            reference = self._export(model_dir, path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+
+        if reference is not None and cfg.onnx_parity_check:
+            try:
+                check_parity(reference, self, _PARITY_TEXTS, cfg.onnx_min_similarity)
+            except ValueError:
+                os.remove(path)  # export again next time
+                raise
+        precision = "int8" if quantize else "float32"
+        logger.info(f"GTE model loaded with ONNX Runtime ({precision})")
+
+    def _export(self, model_dir: str, path: str) -> GTEEmbeddingModel:
+        """Exports the model to path, returns the torch model for reference."""
+        model_name = config.embedding_factory.model_name
+        os.makedirs(model_dir, exist_ok=True)
+        logger.info(f"Exporting {model_name} to {path}...")
+        # the unpadding and memory efficient attention of the GTE code do not
+        # trace, the plain attention is equivalent
+        model = load_gte_model(
+            torch.float32,
+            unpad_inputs=False,
+            use_memory_efficient_attention=False,
+        ).eval()
+
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(fp32_path):
+            sample = self.tokenizer(
+                ["sample text", "a"], padding=True, return_tensors="pt"
+            )
+            torch.onnx.export(
+                _ClsEmbedding(model),
+                (sample.input_ids, sample.attention_mask),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["embedding"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "embedding": {0: "batch"},
+                },
+                opset_version=_OPSET_VERSION,
+                dynamo=False,
+            )
+        if path != fp32_path:
+            # int8 weights, activations are quantized on the fly
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+        return _TorchReference(self.tokenizer, model)
+
+    def _encode_batch(self, batch: list[str]) -> np.ndarray:
+        with self.stats.time("tokenize"):
+            tokens = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                return_tensors="np",
+                max_length=self.max_length,
+            )
+        attention_mask = tokens.attention_mask.astype(np.int64)
+        self._observe_tokens(int(attention_mask.sum()), attention_mask.size)
+        # inputs and outputs stay in host memory, there is no transfer
+        with self.stats.time("forward"):
+            (embeddings,) = self.session.run(
+                ["embedding"],
+                {
+                    "input_ids": tokens.input_ids.astype(np.int64),
+                    "attention_mask": attention_mask,
+                },
+            )
+        return embeddings
@@ -0,0 +1,107 @@
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Sequence
+import numpy as np
+from transformers import XLMRobertaTokenizerFast
+
+from ..config import config
+from ..metrics import metrics
+from .model import BaseEmbeddingModel, load_tokenizer
+from .model_gte import count_tokens
+from .stats import EncoderStats
+
+logger = logging.getLogger(__name__)
+
+_pool_workers = metrics.gauge(
+    "semantic_index_encoder_workers",
+    "Worker processes of the encoder pool",
+)
+
+# the model of a worker process, loaded when the process starts
+_worker_model: BaseEmbeddingModel | None = None
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_model
+    import torch
+
+    from .factory import create_local_model
+
+    torch.set_num_threads(threads)
+    _worker_model = create_local_model(threads=threads)
+
+
+def _encode_in_worker(batch: list[str]) -> tuple[np.ndarray, EncoderStats]:
+    assert _worker_model is not None
+    # the stats of this batch are merged into those of the pool
+    _worker_model.stats = EncoderStats()
+    return _worker_model._encode_batch(batch), _worker_model.stats
+
+
+def _max_length_in_worker() -> int | None:
+    assert _worker_model is not None
+    return _worker_model.max_length
+
+
+class EncoderPool(BaseEmbeddingModel):
+    """
+    Encodes batches in parallel in worker processes that each load a copy of
+    the local model (see create_local_model) and use threads_per_worker
+    threads, by default an equal share of the CPU cores. Meant for CPU
+    inference, where one process does not scale to many cores.
+
+    The tokenizer is loaded in this process to sort and split batches. The
+    workers send the stats of each batch along with its vectors.
+    """
+
+    def __init__(self, workers: int, threads_per_worker: int | None = None):
+        super().__init__()
+        cfg = config.embedding_factory
+        if threads_per_worker is None:
+            threads_per_worker = cfg.pool_threads_per_worker
+        if threads_per_worker <= 0:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+        self.tokenizer: XLMRobertaTokenizerFast = load_tokenizer()  # type: ignore
+        # workers are started fresh (not forked), torch and its thread pools
+        # are not fork safe
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads_per_worker,),
+        )
+        atexit.register(self.shutdown)
+        # a task per worker starts all of them and waits until they are loaded
+        futures = [self._executor.submit(_max_length_in_worker) for _ in range(workers)]
+        self.max_length = [future.result() for future in futures][0]
+        _pool_workers.set(workers)
+        logger.info(
+            f"Encoder pool of {workers} workers with {threads_per_worker} threads each"
+        )
+
+    def _text_lengths(self, texts: Sequence[str]) -> Sequence[int]:
+        with self.stats.time("tokenize"):
+            return count_tokens(self.tokenizer, texts, self.max_length)
+
+    def _encode_batch(self, batch: list[str]) -> np.ndarray:
+        return self._merge(self._executor.submit(_encode_in_worker, batch).result())
+
+    def _encode_batches(self, batches: Iterable[list[str]]) -> Iterator[np.ndarray]:
+        # all batches are queued at once and returned in order
+        return map(self._merge, self._executor.map(_encode_in_worker, batches))
+
+    def _merge(self, result: tuple[np.ndarray, EncoderStats]) -> np.ndarray:
+        # a worker's stats cover exactly this batch
+        embeddings, stats = result
+        self._observe_tokens(stats.tokens, stats.padded_tokens)
+        for stage, seconds in stats.stage_seconds.items():
+            self.stats.observe_stage(stage, seconds)
+        return embeddings
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+        _pool_workers.set(0)
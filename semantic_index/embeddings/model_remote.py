@@ -1,34 +1,225 @@
+import atexit
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .model import BaseEmbeddingModel
+from .transport import EMBEDDINGS_MEDIA_TYPE, decode_embeddings
 from ..config import config
+from ..metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+_host_healthy = metrics.gauge(
+    "semantic_index_remote_host_healthy",
+    "Whether a remote embedding host receives batches (1) or is evicted (0)",
+    ["host"],
+)
+_host_outstanding = metrics.gauge(
+    "semantic_index_remote_host_outstanding",
+    "Batches sent to a remote embedding host and not yet answered",
+    ["host"],
+)
+_host_failures = metrics.counter(
+    "semantic_index_remote_host_failures_total",
+    "Failed batches and health checks of a remote embedding host",
+    ["host"],
+)
+_failovers = metrics.counter(
+    "semantic_index_remote_failovers_total",
+    "Batches sent to another remote embedding host after a failure",
+)
+
+# responses worth retrying, e.g. a restarting server behind a proxy
+_RETRY_STATUS = (429, 502, 503, 504)
+
+
+class NoHealthyHostError(RuntimeError):
+    """Raised when no remote embedding host is available for a batch."""
+
+
+@dataclass
+class _RemoteHost:
+    url: str
+    weight: float
+    healthy: bool = True
+    outstanding: int = 0
+
+    @property
+    def load(self) -> float:
+        return (self.outstanding + 1) / self.weight
+
 
 class RemoteEmbeddingModel(BaseEmbeddingModel):
+    """
+    Encodes batches with one or more embedding factories (embedding_factory.py)
+    over HTTP, up to remote_concurrency batches per host at once on pooled
+    connections. Vectors are received as float16 bytes if the server supports
+    it, as JSON otherwise.
+
+    Each batch goes to the healthy host with the fewest outstanding batches
+    relative to its weight. A host whose request fails is evicted and the
+    batch is sent to another one; evicted hosts are re-admitted once their
+    health check (GET /) succeeds.
+    """
+
     def __init__(self):
         super().__init__()
+        cf = config.embedding_factory
+        self.hosts = [
+            _RemoteHost(url.rstrip("/"), float(weight))
+            for url, weight in _configured_hosts()
+        ]
+        assert all(h.weight > 0 for h in self.hosts), "Host weights must be positive"
+        concurrency = max(1, cf.remote_concurrency)
+
+        # encoding is idempotent, so POST requests are retried as well; with
+        # several hosts a refused connection fails over to another one at once
+        retry = Retry(
+            total=cf.remote_retries,
+            connect=0 if len(self.hosts) > 1 else None,
+            backoff_factor=cf.remote_backoff_seconds,
+            status_forcelist=_RETRY_STATUS,
+            allowed_methods=["POST"],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=len(self.hosts),
+            pool_maxsize=concurrency * len(self.hosts),
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        accept = "application/json"
+        if cf.remote_binary:
+            accept = f"{EMBEDDINGS_MEDIA_TYPE}, {accept};q=0.5"
+        self.session.headers.update({"Accept": accept})
+
+        self._lock = threading.Lock()
+        self._host_available = threading.Condition(self._lock)
+        for host in self.hosts:
+            _host_healthy.set(1, host=host.url)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency * len(self.hosts),
+            thread_name_prefix="remote-encode",
+        )
+        self._closed = threading.Event()
+        self._health_thread = threading.Thread(
+            target=self._check_health, name="remote-health", daemon=True
+        )
+        self._health_thread.start()
+        atexit.register(self.close)
 
     def _encode_batch(self, batch: list[str]) -> np.ndarray:
-        cf = config.embedding_factory
-        url = f"{cf.remote_host}:{cf.remote_port}{cf.remote_endpoint}"
+        tried: set[str] = set()
+        while True:
+            host = self._acquire(tried)
+            try:
+                return self._post(host, batch)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code < 500:
+                    # a bad request fails on any host
+                    logger.error(f"Remote embedding request failed: {e}")
+                    raise
+                failure = e
+            except Exception as e:
+                failure = e
+            finally:
+                self._release(host)
+
+            _host_failures.inc(host=host.url)
+            logger.error(f"Remote embedding request to {host.url} failed: {failure}")
+            self._evict(host)
+            tried.add(host.url)
+            if len(tried) == len(self.hosts):
+                raise failure
+            _failovers.inc()
 
-        headers = {"Content-Type": "application/json"}
-        data = {"batch": batch}
+    def _encode_batches(self, batches: Iterable[list[str]]) -> Iterator[np.ndarray]:
+        # all batches are queued at once and returned in order
+        return self._executor.map(self._encode_batch, batches)
 
-        try:
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
+    def _post(self, host: _RemoteHost, batch: list[str]) -> np.ndarray:
+        # tokenizing and the forward pass happen remotely, within the request
+        with self.stats.time("transfer"):
+            response = self.session.post(
+                f"{host.url}{config.embedding_factory.remote_endpoint}",
+                json={"batch": batch},
                 timeout=config.embedding_factory.timeout_seconds,
             )
-            response.raise_for_status()
-            embeddings = response.json()
-            return np.array(embeddings)
-        except Exception as e:
-            logger.error(f"Remote embedding request failed: {e}")
-            raise
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if content_type.startswith(EMBEDDINGS_MEDIA_TYPE):
+            return decode_embeddings(response.content).astype(np.float32)
+        return np.array(response.json(), dtype=np.float32)
+
+    def _acquire(self, tried: set[str]) -> _RemoteHost:
+        # waits for a health check to re-admit a host if all are evicted
+        timeout = config.embedding_factory.timeout_seconds
+        with self._host_available:
+            while True:
+                candidates = [h for h in self.hosts if h.healthy and h.url not in tried]
+                if candidates:
+                    host = min(candidates, key=lambda h: h.load)
+                    host.outstanding += 1
+                    _host_outstanding.set(host.outstanding, host=host.url)
+                    return host
+                if not self._host_available.wait(timeout):
+                    raise NoHealthyHostError(
+                        f"No healthy embedding host within {timeout} seconds"
+                    )
+
+    def _release(self, host: _RemoteHost) -> None:
+        with self._lock:
+            host.outstanding -= 1
+            _host_outstanding.set(host.outstanding, host=host.url)
+
+    def _evict(self, host: _RemoteHost) -> None:
+        with self._lock:
+            if host.healthy:
+                host.healthy = False
+                _host_healthy.set(0, host=host.url)
+                logger.warning(f"Evicted embedding host {host.url}")
+
+    def _check_health(self) -> None:
+        interval = config.embedding_factory.remote_health_check_seconds
+        timeout = min(interval, config.embedding_factory.timeout_seconds)
+        while not self._closed.wait(interval):
+            for host in self.hosts:
+                try:
+                    # not through the session, its retries would delay the check
+                    requests.get(f"{host.url}/", timeout=timeout).raise_for_status()
+                    healthy = True
+                except requests.RequestException as e:
+                    _host_failures.inc(host=host.url)
+                    logger.debug(f"Health check of {host.url} failed: {e}")
+                    healthy = False
+
+                if not healthy:
+                    self._evict(host)
+                    continue
+                with self._host_available:
+                    if not host.healthy:
+                        host.healthy = True
+                        _host_healthy.set(1, host=host.url)
+                        logger.info(f"Re-admitted embedding host {host.url}")
+                        self._host_available.notify_all()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._executor.shutdown(cancel_futures=True)
+        self.session.close()
+
+
+def _configured_hosts() -> list[tuple[str, float]]:
+    cf = config.embedding_factory
+    if not cf.remote_hosts:
+        return [(f"{cf.remote_host}:{cf.remote_port}", 1.0)]
+    return [(h["url"], h.get("weight", 1.0)) for h in cf.remote_hosts]
@@ -0,0 +1,121 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Generator
+
+from ..metrics import metrics
+
+_stage_seconds = metrics.counter(
+    "semantic_index_encoder_stage_seconds_total",
+    "Time spent encoding by stage: tokenize, transfer (to and from the device, "
+    "or the request of a remote encoder) and forward",
+    ["stage"],
+)
+_batch_tokens = metrics.histogram(
+    "semantic_index_batch_tokens",
+    "Number of tokens (including padding) of a batch run through the encoder",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+_texts_per_second = metrics.gauge(
+    "semantic_index_encoder_texts_per_second",
+    "Texts per second of the last call to encode",
+)
+
+STAGES = ("tokenize", "transfer", "forward")
+
+
+class EncoderStats:
+    """
+    Totals of the encoding work of a model: texts and their wall time per call
+    to encode, and per batch the tokens and the time of each stage. Tells
+    whether encoding is bound by the tokenizer, the transfers or the model.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.texts = 0
+            self.seconds = 0.0
+            self.batches = 0
+            self.tokens = 0
+            self.padded_tokens = 0
+            self.stage_seconds = {stage: 0.0 for stage in STAGES}
+
+    @contextmanager
+    def time(self, stage: str) -> Generator[None, None, None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+        _stage_seconds.inc(seconds, stage=stage)
+
+    def observe_batch(self, num_tokens: int, num_padded: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.tokens += num_tokens
+            self.padded_tokens += num_padded
+        _batch_tokens.observe(num_padded)
+
+    def observe_encode(self, num_texts: int, seconds: float) -> None:
+        with self._lock:
+            self.texts += num_texts
+            self.seconds += seconds
+        if seconds > 0:
+            _texts_per_second.set(num_texts / seconds)
+
+    def summary(self) -> dict[str, float]:
+        with self._lock:
+            summary = {
+                "texts": self.texts,
+                "seconds": self.seconds,
+                "texts_per_second": self.texts / self.seconds if self.seconds else 0.0,
+                "batches": self.batches,
+                "tokens": self.tokens,
+                "padded_tokens": self.padded_tokens,
+                "tokens_per_batch": (
+                    self.padded_tokens / self.batches if self.batches else 0.0
+                ),
+                "padding_ratio": (
+                    1 - self.tokens / self.padded_tokens if self.padded_tokens else 0.0
+                ),
+            }
+            for stage, seconds in self.stage_seconds.items():
+                summary[f"{stage}_seconds"] = seconds
+        return summary
+
+    def format(self) -> str:
+        """A breakdown of the time spent encoding, for the command line."""
+        s = self.summary()
+        lines = [
+            f"{s['texts']} texts in {s['seconds']:.2f} s "
+            f"({s['texts_per_second']:.1f} texts/s), {s['batches']} batches of "
+            f"{s['tokens_per_batch']:.0f} tokens on average, "
+            f"{s['padding_ratio']:.1%} padding",
+        ]
+        for stage in STAGES:
+            seconds = s[f"{stage}_seconds"]
+            share = seconds / s["seconds"] if s["seconds"] else 0.0
+            lines.append(f"  {stage:<10} {seconds:>9.3f} s {share:>7.1%}")
+        # e.g. sorting by length and collecting the results; negative if the
+        # batches are encoded in parallel
+        other = s["seconds"] - sum(s[f"{stage}_seconds"] for stage in STAGES)
+        lines.append(f"  {'other':<10} {other:>9.3f} s")
+        return "\n".join(lines)
+
+    def __getstate__(self) -> dict:
+        # sent back by the workers of an encoder pool
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,28 @@
+import struct
+import numpy as np
+
+# response format of the embedding factory negotiated with the Accept header:
+# the number of vectors and their dimension as little endian uint32, followed
+# by the vectors as little endian float16, row by row
+EMBEDDINGS_MEDIA_TYPE = "application/x-semantic-index-embeddings"
+_HEADER = struct.Struct("<II")
+
+
+def encode_embeddings(embeddings: np.ndarray) -> bytes:
+    rows, dims = embeddings.shape
+    data = np.ascontiguousarray(embeddings, dtype="<f2").tobytes()
+    return _HEADER.pack(rows, dims) + data
+
+
+def decode_embeddings(payload: bytes) -> np.ndarray:
+    if len(payload) < _HEADER.size:
+        raise ValueError(f"Embeddings payload too short ({len(payload)} bytes)")
+    rows, dims = _HEADER.unpack_from(payload)
+    expected = _HEADER.size + rows * dims * 2
+    if len(payload) != expected:
+        raise ValueError(
+            f"Embeddings payload of {len(payload)} bytes, expected {expected} "
+            f"for {rows}x{dims} vectors"
+        )
+    data = np.frombuffer(payload, dtype="<f2", offset=_HEADER.size)
+    return data.reshape(rows, dims)
@@ -0,0 +1,212 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Generator, Generic, Iterable, Iterator, Sequence, TypeVar
+
+LabelValues = tuple[str, ...]
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Metric:
+    type_ = ""
+
+    def __init__(
+        self, name: str, help_: str, labels: Sequence[str], lock: threading.Lock
+    ):
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self._lock = lock
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        expected = set(self.labels)
+        assert set(labels) == expected, f"{self.name} expects labels {self.labels}"
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labels, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _labels_dict(self, values: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labels, values))
+
+
+class Counter(_Metric):
+    type_ = "counter"
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(k)} {_num(v)}" for k, v in items]
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            items = list(self._values.items())
+        return [{"labels": self._labels_dict(k), "value": v} for k, v in items]
+
+
+class Gauge(Counter):
+    type_ = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type_ = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # per label values: count per bucket (not cumulative), sum, count
+        self._values: dict[LabelValues, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Generator[None, None, None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(c), t, n)) for k, (c, t, n) in self._values.items()]
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if math.isinf(bound) else f'le="{_num(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_num(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            items = [(k, t, n) for k, (_, t, n) in self._values.items()]
+        return [
+            {
+                "labels": self._labels_dict(k),
+                "count": n,
+                "sum": total,
+                "mean": total / n if n else 0.0,
+            }
+            for k, total, n in items
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+
+    def _get_or_create(
+        self, cls, name: str, help_: str, labels: Sequence[str], **kwargs
+    ):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_, labels, self._lock, **kwargs)
+                self._metrics[name] = metric
+        assert isinstance(metric, cls), f"Metric {name} registered as {metric.type_}"
+        return metric
+
+    def counter(self, name: str, help_: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_, labels)
+
+    def gauge(self, name: str, help_: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help_: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help_, labels, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_}")
+            lines.extend(metric.render())  # type: ignore
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict[str, list[dict]]:
+        """Returns all recorded metrics as a JSON serializable dict."""
+        summary = {}
+        for name, metric in list(self._metrics.items()):
+            samples = metric.summary()  # type: ignore
+            if samples:
+                summary[name] = samples
+        return summary
+
+
+class TimedIterator(Generic[T]):
+    """Iterates an iterable while measuring the time spent producing its items."""
+
+    def __init__(self, iterable: Iterable[T]):
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator[T]:
+        return self
+
+    def __next__(self) -> T:
+        started = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = MetricsRegistry()
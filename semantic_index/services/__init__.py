@@ -1,2 +1,5 @@
 from .processing import ProcessingService
-from .search import SearchService
+from .retry import ErrorKind, classify_error
+from .scheduler import ProcessingScheduler, SchedulingPolicy
+from .search import SearchMode, SearchService
+from .watch import WatchService
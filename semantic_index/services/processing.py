@@ -1,39 +1,90 @@
 import logging
-from typing import Iterator
+import time
+from itertools import islice
+from typing import Iterable, Iterator
 from tqdm import tqdm
 import traceback
 from datetime import datetime
 
-from ..data import Source, EmbeddingRepository, SourceRepository
-from ..embeddings import chunk_text, EmbeddingFactory
-from ..sources import BaseSourceHandler, Handler
-
+from ..config import ChunkingConfig, config
+from ..data import (
+    JOURNAL_COMPLETED,
+    JOURNAL_FAILED,
+    Embedding,
+    Source,
+    EmbeddingRepository,
+    ProcessingJournalRepository,
+    SourceContentRepository,
+    SourceRepository,
+)
+from ..data.types import TextCompressor
+from ..embeddings import iter_separated_words, EmbeddingFactory
+from ..metrics import metrics, TimedIterator
+from ..sources import BaseSourceHandler, Handler, get_file_extension
+from .retry import ErrorKind, classify_error, get_next_retry
+from .scheduler import ProcessingScheduler, SchedulingPolicy
 
 logger = logging.getLogger(__name__)
 
+_queue_depth = metrics.gauge(
+    "semantic_index_queue_depth",
+    "Sources waiting in the current processing stage",
+    ["stage"],
+)
+_processed = metrics.counter(
+    "semantic_index_sources_processed_total",
+    "Sources processed, by handler and result",
+    ["handler", "result"],
+)
+_errors = metrics.counter(
+    "semantic_index_processing_errors_total",
+    "Processing errors, by handler and error kind",
+    ["handler", "kind"],
+)
+_process_seconds = metrics.histogram(
+    "semantic_index_source_process_seconds",
+    "Time to process a single source end to end",
+    ["handler"],
+)
+_content_store = metrics.counter(
+    "semantic_index_content_store_lookups_total",
+    "Content store lookups, by result",
+    ["result"],
+)
+_db_write_seconds = metrics.histogram(
+    "semantic_index_db_write_seconds",
+    "Latency of database writes",
+    ["operation"],
+)
+
 
 class ProcessingService:
     def __init__(
         self,
         source_repo: SourceRepository,
         embedding_repo: EmbeddingRepository,
+        content_repo: SourceContentRepository,
+        journal_repo: ProcessingJournalRepository,
         embedding_factory: EmbeddingFactory,
         handler: Handler,
     ):
         self._source_repo = source_repo
         self._embedding_repo = embedding_repo
+        self._content_repo = content_repo
+        self._journal_repo = journal_repo
         self._embedding_factory = embedding_factory
         self._handler = handler
 
     def ingest_sources(self, sources: Iterator[Source]) -> None:
         logger.info("Ingesting sources...")
         try:
-            batch_size = 100
+            batch_size = config.processing.ingest_batch_size
             updated, inserted = 0, 0
 
             def _handle_batch():
                 nonlocal updated, inserted
-                updated_batch, inserted_batch = self._source_repo.upsert_many(batch)
+                with _db_write_seconds.time(operation="upsert_sources"):
+                    updated_batch, inserted_batch = self._source_repo.upsert_many(batch)
                 updated += updated_batch
                 inserted += inserted_batch
                 batch.clear()
@@ -49,65 +100,281 @@ class ProcessingService:
             logger.warning("Ingestion operation interrupted by user.")
         logger.info("Ingestion complete.")
 
-    def process_pending_sources(self) -> None:
+    def count_pending(self) -> int:
+        """Number of pending sources of the registered source handlers."""
+        return self._source_repo.count_pending(list(self._handler.handlers_by_id))
+
+    def process_pending_sources(
+        self,
+        max_sources: int | None = None,
+        time_budget: float | None = None,
+        run_id: int | None = None,
+    ) -> bool:
+        """
+        Processes pending sources in the order of the configured scheduling
+        policy, then retries failed sources whose backoff has expired. Stops
+        claiming new sources once max_sources were processed or time_budget
+        seconds have passed. Returns False if interrupted by the user.
+        Journals into run_id if given, which is left open for the caller to
+        finish, otherwise into a run of its own.
+        """
         logger.info("Processing sources...")
-        sources = self._source_repo.get_all()
-        if not sources:
-            logger.info("No sources to process")
-            return
-
-        todo = [
-            s
-            for s in sources
-            if not s.error
-            and (not s.last_processed or s.obj_modified > s.last_processed)
-        ]
-        skipped = len(sources) - len(todo)
-        logger.info(f"{skipped} sources skipped, {len(todo)} sources to process.")
-        if not todo:
-            logger.info("Processing complete.")
-            return
+        deadline = None if time_budget is None else time.monotonic() + time_budget
+        own_run = run_id is None
+        if own_run:
+            run_id = self.begin_run()
+
+        pending = self.count_pending()
+        logger.info(f"{pending} sources to process.")
+
+        scheduler = ProcessingScheduler(
+            source_repo=self._source_repo,
+            handler_ids=list(self._handler.handlers_by_id),
+            policy=SchedulingPolicy(config.processing.policy),
+            fair_share=config.processing.fair_share,
+        )
+        ok, error, interrupted = self._process_stage(
+            "Processing", scheduler, pending, run_id, max_sources, deadline, scheduler
+        )
+        if interrupted:
+            return False
+        logger.info(f"{ok} ok, {error} errors occurred.")
+
+        # retry stage, sources that failed above are not due yet
+        now = datetime.now()
+        retry_due = self._source_repo.count_retry_due(now)
+        logger.info(f"{retry_due} failed sources due for retry.")
+        remaining = None if max_sources is None else max_sources - ok - error
+        ok, error, interrupted = self._process_stage(
+            "Retrying",
+            self._source_repo.iter_retry_due(now),
+            retry_due,
+            run_id,
+            remaining,
+            deadline,
+        )
+        if interrupted:
+            return False
+        logger.info(f"{ok} recovered, {error} failed again.")
 
+        if own_run:
+            self.finish_run(run_id)
+        logger.info("Processing complete.")
+        return True
+
+    def _process_stage(
+        self,
+        desc: str,
+        sources: Iterable[Source],
+        count: int,
+        run_id: int,
+        max_sources: int | None,
+        deadline: float | None,
+        scheduler: ProcessingScheduler | None = None,
+    ) -> tuple[int, int, bool]:
+        """Returns (ok, error, interrupted by user) for the given stage."""
         ok, error = 0, 0
-        for source in tqdm(todo, desc="Processing", unit=" Sources"):
+        if not count or (max_sources is not None and max_sources <= 0):
+            return ok, error, False
+
+        stage = desc.lower()
+        _queue_depth.set(count, stage=stage)
+        total = count if max_sources is None else min(count, max_sources)
+        for source in tqdm(sources, total=total, desc=desc, unit=" Sources"):
+            if max_sources is not None and ok + error >= max_sources:
+                logger.info("Reached limit of sources to process.")
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info("Time budget used up.")
+                break
+
+            handler_name = self._handler.find_by_id(source.source_handler_id).name
+            source_started = time.monotonic()
+            self._journal_repo.claim(run_id, source.id)
             try:
                 self.process_single_source(source)
+                self._journal_repo.complete(run_id, source.id)
+                _processed.inc(handler=handler_name, result="ok")
                 ok += 1
+            except KeyboardInterrupt:
+                self._journal_repo.release(run_id, source.id)
+                logger.warning(
+                    f"Processing interrupted by user, run {run_id} resumes on next start."
+                )
+                return ok, error, True
             except Exception as e:
                 error += 1
-                source.error = True
-                source.error_message = str(e)
-                self._source_repo.update(source)
+                kind = classify_error(e)
+                _processed.inc(handler=handler_name, result="error")
+                _errors.inc(handler=handler_name, kind=kind.value)
+                self._mark_failed(source, str(e), kind)
+                self._journal_repo.fail(run_id, source.id)
                 stacktrace = traceback.format_exc()
-                logger.error(f"Error processing {source.uri}: {e}\n{stacktrace}")
+                logger.error(
+                    (
+                        f"Error processing {source.uri} ({kind.value}, attempt "
+                        f"{source.attempts}, next retry {source.next_retry}): "
+                        f"{e}\n{stacktrace}"
+                    )
+                )
+            elapsed = time.monotonic() - source_started
+            _process_seconds.observe(elapsed, handler=handler_name)
+            _queue_depth.dec(stage=stage)
+            if scheduler is not None:
+                scheduler.report(source, elapsed)
+        _queue_depth.set(0, stage=stage)
+        return ok, error, False
 
-        logger.info(f"{ok} ok, {error} errors occurred.")
-        logger.info("Processing complete.")
+    def begin_run(self) -> int:
+        """Starts a processing run, or resumes the one that was interrupted."""
+        run = self._journal_repo.get_unfinished_run()
+        if run is None:
+            run = self._journal_repo.start_run()
+            logger.info(f"Started processing run {run.id}.")
+            return run.id
 
-    def process_single_source(self, source: Source) -> None:
-        self._embedding_repo.delete_by_source_id(source.id)
+        counts = self._journal_repo.count_by_state(run.id)
+        logger.info(
+            (
+                f"Resuming processing run {run.id} started {run.started}: "
+                f"{counts.get(JOURNAL_COMPLETED, 0)} completed, "
+                f"{counts.get(JOURNAL_FAILED, 0)} failed."
+            )
+        )
 
-        handler: BaseSourceHandler = self._handler.find_by_id(source.source_handler_id)
-        contents = handler.read(source)
-        if not contents or not contents.strip():
-            raise ValueError(f"Source {source.uri} is empty")
+        # sources that were claimed but never finished brought the previous
+        # attempt down (crash, OOM, kill), so don't retry them indefinitely
+        max_interruptions = config.processing.max_interruptions
+        for entry in self._journal_repo.get_interrupted(run.id):
+            if entry.attempts < max_interruptions:
+                continue
+            source = self._source_repo.get_by_id(entry.source_id)
+            if source is None:
+                continue
+            logger.error(
+                f"Source {source.uri} interrupted processing {entry.attempts} times, marking as failed."
+            )
+            self._mark_failed(
+                source,
+                f"Processing interrupted {entry.attempts} times",
+                ErrorKind.PERMANENT,
+            )
+            self._journal_repo.fail(run.id, source.id)
+        return run.id
+
+    def finish_run(self, run_id: int) -> None:
+        self._journal_repo.finish_run(run_id)
+
+    def _mark_failed(self, source: Source, message: str, kind: ErrorKind) -> None:
+        source.attempts = (source.attempts or 0) + 1
+        source.error = True
+        source.error_kind = kind.value
+        source.error_message = message
+        source.next_retry = get_next_retry(kind, source.attempts)
+        self._source_repo.update(source)
+
+    def process_single_source(self, source: Source) -> None:
+        # the text is streamed from the content store or the handler through the
+        # chunker and encoder into the database, and stored again if it was read
+        compressor: TextCompressor | None = None
+        handler = self._handler.find_by_id(source.source_handler_id)
+        stored = self._content_repo.iter_current(source)
+        if stored is not None:
+            _content_store.inc(result="hit")
+            words = iter_separated_words(stored, normalized=True)
+        else:
+            _content_store.inc(result="miss")
+            compressor = TextCompressor()
+            words = compressor.tee_words(handler.read_words(source))
 
-        embeddings = self._embedding_factory.process(contents, source)
-        self._embedding_repo.create_many(embeddings)
+        chunking = self._get_chunking(handler, source)
+        embeddings = TimedIterator(
+            self._embedding_factory.process_stream(words, source, chunking)
+        )
 
         now = datetime.now()
         source.last_checked = now
         source.last_processed = now
         source.error = False
         source.error_message = None
-        self._source_repo.update(source)
+        source.error_kind = None
+        source.attempts = 0
+        source.next_retry = None
+        started = time.perf_counter()
+        self._embedding_repo.replace_for_source(source, embeddings)
+        # reading and encoding happen while the embeddings are consumed
+        _db_write_seconds.observe(
+            time.perf_counter() - started - embeddings.seconds,
+            operation="replace_embeddings",
+        )
 
-    def read_chunk_content(self, source: Source, chunk_idx: int) -> str:
-        handler = self._handler.find_by_id(source.source_handler_id)
+        if compressor is not None:
+            with _db_write_seconds.time(operation="store_content"):
+                self._content_repo.put_compressed(source, *compressor.finish())
+
+    def reprocess_all_sources(self) -> None:
+        logger.info("Reprocessing sources...")
+        todo = self._source_repo.iter_processed()
+
+        ok, error = 0, 0
+        for source in tqdm(todo, desc="Reprocessing", unit=" Sources"):
+            try:
+                self.process_single_source(source)
+                ok += 1
+            except Exception as e:
+                error += 1
+                stacktrace = traceback.format_exc()
+                logger.error(f"Error reprocessing {source.uri}: {e}\n{stacktrace}")
+
+        logger.info(f"{ok} ok, {error} errors occurred.")
+        logger.info("Reprocessing complete.")
+
+    @staticmethod
+    def _get_chunking(handler: BaseSourceHandler, source: Source) -> ChunkingConfig:
+        return config.chunking.for_source(handler.name, get_file_extension(source.uri))
+
+    def read_content(self, source: Source) -> str:
+        """
+        Returns the normalized text of the source. The text is served from the
+        content store as long as the source did not change since it was last
+        extracted, otherwise it is read through the handler and stored.
+        """
+        content = self._content_repo.get_current(source)
+        if content is not None:
+            _content_store.inc(result="hit")
+            return content
+
+        _content_store.inc(result="miss")
+        handler: BaseSourceHandler = self._handler.find_by_id(source.source_handler_id)
         content = handler.read(source)
-        chunks = chunk_text(content)
+        if content:
+            with _db_write_seconds.time(operation="store_content"):
+                self._content_repo.put(source, content)
+        return content
 
-        if chunk_idx < 0 or chunk_idx >= len(chunks):
+    def read_embedding_content(self, embedding: Embedding) -> str:
+        content = self._embedding_repo.get_content(embedding.id)
+        if content is not None:
+            return content
+
+        # embeddings created before chunk texts were persisted
+        source = self._source_repo.get_by_id(embedding.source_id)
+        if source is None:
+            raise KeyError(f"Source for embedding {embedding.id} not found")
+        return self.read_chunk_content(source, embedding.chunk_idx)
+
+    def read_chunk_content(self, source: Source, chunk_idx: int) -> str:
+        if chunk_idx < 0:
+            raise IndexError(f"Chunk index {chunk_idx} out of range")
+
+        # chunk as when processing, so the indices match
+        content = self.read_content(source)
+        words = iter_separated_words([content], normalized=True)
+        handler = self._handler.find_by_id(source.source_handler_id)
+        chunking = self._get_chunking(handler, source)
+        chunks = self._embedding_factory.chunk_words(words, chunking)
+        chunk = next(islice(chunks, chunk_idx, None), None)
+        if chunk is None:
             raise IndexError(f"Chunk index {chunk_idx} out of range")
 
-        return chunks[chunk_idx].text
+        return chunk.text
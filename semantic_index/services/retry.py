@@ -0,0 +1,54 @@
+import subprocess
+from datetime import datetime, timedelta
+from enum import Enum
+import requests
+
+from ..config import config
+
+
+class ErrorKind(Enum):
+    TRANSIENT = "transient"  # e.g. Jira 503, connection reset, locked file
+    TIMEOUT = "timeout"  # e.g. remote encoder or parser did not answer in time
+    PERMANENT = "permanent"  # e.g. corrupt or unsupported file
+
+
+def classify_error(error: BaseException) -> ErrorKind:
+    # look through explicitly chained exceptions, readers often wrap the cause
+    current: BaseException | None = error
+    while current is not None:
+        kind = _classify_single(current)
+        if kind != ErrorKind.PERMANENT:
+            return kind
+        current = current.__cause__
+    return ErrorKind.PERMANENT
+
+
+def _classify_single(error: BaseException) -> ErrorKind:
+    if isinstance(error, (TimeoutError, requests.Timeout, subprocess.TimeoutExpired)):
+        return ErrorKind.TIMEOUT
+
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if status == 408:
+            return ErrorKind.TIMEOUT
+        if status == 429 or status >= 500:
+            return ErrorKind.TRANSIENT
+        return ErrorKind.PERMANENT
+
+    if isinstance(error, (requests.ConnectionError, ConnectionError)):
+        return ErrorKind.TRANSIENT
+    if isinstance(error, PermissionError):
+        # on Windows files that are open in another application are locked
+        return ErrorKind.TRANSIENT
+    return ErrorKind.PERMANENT
+
+
+def get_next_retry(kind: ErrorKind, attempts: int) -> datetime | None:
+    """Returns when to retry after the given number of failed attempts, if at all."""
+    cfg = config.processing
+    if kind == ErrorKind.PERMANENT or attempts >= cfg.retry_max_attempts:
+        return None
+
+    delay = cfg.retry_base_seconds * 2 ** max(attempts - 1, 0)
+    delay = min(delay, cfg.retry_max_seconds)
+    return datetime.now() + timedelta(seconds=delay)
@@ -0,0 +1,87 @@
+import heapq
+import logging
+from enum import Enum
+from typing import Iterator
+
+from ..data import Source, SourceRepository
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulingPolicy(Enum):
+    RECENT = "recent"  # most recently modified first
+    SMALLEST = "smallest"  # smallest first, sources without a size count as empty
+    ID = "id"  # ingestion order
+
+
+class ProcessingScheduler:
+    """
+    Decides in which order pending sources are processed. With fair share
+    enabled, every source handler gets an equal share of the processing time,
+    so slow sources of one handler (e.g. huge spreadsheets) cannot starve the
+    sources of another (e.g. Jira comments).
+    """
+
+    def __init__(
+        self,
+        source_repo: SourceRepository,
+        handler_ids: list[int],
+        policy: SchedulingPolicy,
+        fair_share: bool,
+    ):
+        self._source_repo = source_repo
+        self._handler_ids = handler_ids
+        self._policy = policy
+        self._fair_share = fair_share
+        self._time_used: dict[int, float] = {id_: 0.0 for id_ in handler_ids}
+
+    def _iter_pending(self, handler_id: int) -> Iterator[Source]:
+        if self._policy == SchedulingPolicy.RECENT:
+            return self._source_repo.iter_pending(
+                sort_key=Source.obj_modified, descending=True, handler_id=handler_id
+            )
+        if self._policy == SchedulingPolicy.SMALLEST:
+            return self._source_repo.iter_pending(
+                sort_key=Source.obj_size, handler_id=handler_id
+            )
+        return self._source_repo.iter_pending(handler_id=handler_id)
+
+    def _iter_merged(self) -> Iterator[Source]:
+        # every handler's queue is read through its own index, merging them is
+        # cheaper than sorting all pending sources at once
+        queues = [self._iter_pending(id_) for id_ in self._handler_ids]
+        if self._policy == SchedulingPolicy.RECENT:
+            return heapq.merge(
+                *queues, key=lambda s: (s.obj_modified, s.id), reverse=True
+            )
+        if self._policy == SchedulingPolicy.SMALLEST:
+            return heapq.merge(*queues, key=lambda s: (s.obj_size, s.id))
+        return heapq.merge(*queues, key=lambda s: s.id)
+
+    def __iter__(self) -> Iterator[Source]:
+        if not self._fair_share:
+            yield from self._iter_merged()
+            return
+
+        queues = {id_: self._iter_pending(id_) for id_ in self._handler_ids}
+        heads: dict[int, Source] = {}
+        for handler_id, queue in queues.items():
+            head = next(queue, None)
+            if head is not None:
+                heads[handler_id] = head
+
+        while heads:
+            # the handler that consumed the least processing time goes next
+            handler_id = min(heads, key=lambda id_: self._time_used[id_])
+            yield heads[handler_id]
+
+            head = next(queues[handler_id], None)
+            if head is None:
+                del heads[handler_id]
+            else:
+                heads[handler_id] = head
+
+    def report(self, source: Source, seconds: float) -> None:
+        """Accounts the processing time spent on a source to its handler."""
+        if source.source_handler_id in self._time_used:
+            self._time_used[source.source_handler_id] += seconds
@@ -1,24 +1,38 @@
 import logging
 import numpy as np
+from enum import Enum
 from typing import Sequence
 
-from ..data import Embedding, EmbeddingRepository, SourceRepository
+from ..config import config
+from ..data import (
+    Embedding,
+    EmbeddingRepository,
+    SourceRepository,
+    SparsePostingRepository,
+)
 from ..embeddings import get_similarities, EmbeddingFactory
 from ..api import SearchResponse, SearchRequest
 
-
 logger = logging.getLogger(__name__)
 
 
+class SearchMode(Enum):
+    DENSE = "dense"  # cosine similarity of the embeddings
+    SPARSE = "sparse"  # dot product of the sparse lexical weights
+    HYBRID = "hybrid"  # dense + hybrid_sparse_weight * sparse
+
+
 class SearchService:
     def __init__(
         self,
         embedding_repo: EmbeddingRepository,
         source_repo: SourceRepository,
+        sparse_repo: SparsePostingRepository,
         embedding_factory: EmbeddingFactory,
     ):
         self._embedding_repo = embedding_repo
         self._source_repo = source_repo
+        self._sparse_repo = sparse_repo
         self._embedding_factory = embedding_factory
 
     def _get_similar_embeddings(
@@ -30,9 +44,27 @@ class SearchService:
         if not embeddings:
             return [], np.array([]), np.array([])
 
-        query_emb = self._embedding_factory.model.encode([request.query])[0]
-        emb_matrix = np.vstack([e.embedding for e in embeddings])
-        similarities, indices = get_similarities(query_emb, emb_matrix)
+        mode = SearchMode(request.mode or config.search.mode)
+        model = self._embedding_factory.model
+        if mode == SearchMode.DENSE:
+            query_emb = model.encode([request.query])[0]
+            emb_matrix = np.vstack([e.embedding for e in embeddings])
+            similarities, indices = get_similarities(query_emb, emb_matrix)
+            return embeddings, similarities, indices
+
+        if not self._embedding_factory.sparse:
+            raise ValueError(f"Search mode {mode.value} requires sparse weights")
+        query_embs, query_weights = model.encode_sparse([request.query])
+        # chunks without a token of the query score 0
+        scores = self._sparse_repo.get_scores(query_weights[0])
+        similarities = np.array([scores.get(e.id, 0.0) for e in embeddings])
+        if mode == SearchMode.HYBRID:
+            emb_matrix = np.vstack([e.embedding for e in embeddings])
+            dense, _ = get_similarities(query_embs[0], emb_matrix)
+            similarities = dense + config.search.hybrid_sparse_weight * similarities
+        indices = np.argsort(similarities)[::-1]
+        if mode == SearchMode.SPARSE:
+            indices = indices[similarities[indices] > 0]
         return embeddings, similarities, indices
 
     def search_chunks(self, request: SearchRequest) -> list[SearchResponse]:
@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Iterator
+
+from ..config import config
+from ..data import Source, SourceRepository
+from ..sources import FileChange, FileWatcher, FileSourceHandler, create_file_watcher
+from .processing import ProcessingService
+
+logger = logging.getLogger(__name__)
+
+# a file written continuously is ingested at least this often (in debounce periods)
+_MAX_DEBOUNCE_PERIODS = 10
+_IDLE_WAIT_SECONDS = 1.0
+
+
+class WatchService:
+    def __init__(
+        self,
+        processing_service: ProcessingService,
+        source_repo: SourceRepository,
+        file_handler: FileSourceHandler,
+    ):
+        self._processing_service = processing_service
+        self._source_repo = source_repo
+        self._file_handler = file_handler
+
+    def watch(self, base: str) -> None:
+        """
+        Ingests files below base as they are created, modified or deleted and
+        processes pending sources in small batches in between, until interrupted.
+        Changes made while not watching are not picked up, ingest base once
+        before to catch up.
+        """
+        cfg = config.watch
+        with create_file_watcher(base, cfg) as watcher:
+            logger.info(f"Watching {base} for changes ({type(watcher).__name__})...")
+            # a single run for the whole watch instead of one per batch
+            run_id = self._processing_service.begin_run()
+            interrupted = False
+            due = self._next_due()
+            try:
+                while True:
+                    # don't wait for changes while there is work left, and
+                    # wait in slices otherwise so Ctrl+C is handled promptly
+                    # and failed sources are retried once their backoff expired
+                    idle = due is None or due > datetime.now()
+                    timeout = _IDLE_WAIT_SECONDS if idle else 0
+                    changes = watcher.read_changes(timeout=timeout)
+                    if changes:
+                        self._apply_changes(self._settle(watcher, changes))
+                        due = self._next_due()
+
+                    if due is not None and due <= datetime.now():
+                        completed = self._processing_service.process_pending_sources(
+                            max_sources=cfg.batch_size, run_id=run_id
+                        )
+                        if not completed:
+                            # the run resumes on the next start
+                            interrupted = True
+                            break
+                        due = self._next_due()
+            except KeyboardInterrupt:
+                pass
+            if not interrupted:
+                self._processing_service.finish_run(run_id)
+        logger.info(f"Stopped watching {base}.")
+
+    def _next_due(self) -> datetime | None:
+        # now if sources are pending, otherwise when the first failed source is
+        # retried; sources of handlers not registered here are never processed
+        if self._processing_service.count_pending() > 0:
+            return datetime.now()
+        return self._source_repo.get_next_retry()
+
+    def _settle(
+        self, watcher: FileWatcher, changes: list[FileChange]
+    ) -> list[FileChange]:
+        # collect changes until the tree is quiet, the last change of a path wins
+        debounce = config.watch.debounce_seconds
+        deadline = time.monotonic() + debounce * _MAX_DEBOUNCE_PERIODS
+        latest: dict[str, FileChange] = {}
+        while changes:
+            for change in changes:
+                latest.pop(change.path, None)
+                latest[change.path] = change
+            if time.monotonic() >= deadline:
+                break
+            changes = watcher.read_changes(timeout=debounce)
+        return list(latest.values())
+
+    def _apply_changes(self, changes: list[FileChange]) -> None:
+        deleted_files = [c.path for c in changes if c.deleted and not c.is_dir]
+        deleted_dirs = [c.path for c in changes if c.deleted and c.is_dir]
+        if deleted_files or deleted_dirs:
+            prefixes = [os.path.join(path, "") for path in deleted_dirs]
+            deleted = self._source_repo.delete_by_uris(deleted_files, prefixes)
+            logger.info(f"Removed {deleted} deleted sources.")
+
+        changed = [c for c in changes if not c.deleted]
+        if changed:
+            logger.info(f"Ingesting {len(changed)} changed files or directories.")
+            self._processing_service.ingest_sources(self._index_changes(changed))
+
+    def _index_changes(self, changes: list[FileChange]) -> Iterator[Source]:
+        # files in a new directory are reported along with the directory itself
+        seen: set[str] = set()
+        for change in changes:
+            try:
+                if change.is_dir:
+                    sources = self._file_handler.index_all(change.path)
+                else:
+                    sources = iter([self._file_handler.index_one(change.path)])
+                for source in sources:
+                    if source.uri not in seen:
+                        seen.add(source.uri)
+                        yield source
+            except Exception as e:
+                # e.g. removed again in the meantime, the deletion follows
+                logger.warning(f"Failed to index {change.path}: {e}")
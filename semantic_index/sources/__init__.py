@@ -3,3 +3,6 @@ from .base_handler import BaseSourceHandler
 from .file_handler import FileSourceHandler
 from .jira_handler import JiraSourceHandler
 from .external import run_subprocess_with_timeout
+from .io import get_file_extension
+from .parser_pool import ParserPool, ParserError, get_parser_pool
+from .file_watcher import FileChange, FileWatcher, create_file_watcher
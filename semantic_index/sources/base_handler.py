@@ -3,9 +3,22 @@ import logging
 from typing import Iterator
 
 from ..data import Source, SourceHandlerRepository, TagRepository
+from ..embeddings.chunk import iter_separated_words
+from ..metrics import metrics, TimedIterator
 
 logger = logging.getLogger(__name__)
 
+_read_seconds = metrics.histogram(
+    "semantic_index_source_read_seconds",
+    "Time to read the text of a source through its handler",
+    ["handler"],
+)
+_read_chars = metrics.counter(
+    "semantic_index_source_read_chars_total",
+    "Characters of normalized text read from sources",
+    ["handler"],
+)
+
 
 class BaseSourceHandler(abc.ABC):
     def __init__(
@@ -34,10 +47,30 @@ class BaseSourceHandler(abc.ABC):
         pass
 
     def read(self, source: Source) -> str:
-        text = self._read_source(source)
-        assert isinstance(text, str), "Read source must return a string"
-        return " ".join(text.split())
+        return "".join(sep + word for sep, word in self.read_words(source))
+
+    def read_words(self, source: Source) -> Iterator[tuple[str, str]]:
+        """
+        Yields the words of the normalized text of the source incrementally,
+        along with their separators (see iter_separated_words).
+        """
+        pieces = TimedIterator(self._read_source_stream(source))
+        chars = 0
+        for separator, word in iter_separated_words(pieces):
+            chars += len(word) + 1
+            yield separator, word
+        _read_seconds.observe(pieces.seconds, handler=self.name)
+        _read_chars.inc(max(chars - 1, 0), handler=self.name)
 
     @abc.abstractmethod
     def _read_source(self, source: Source) -> str:
         pass
+
+    def _read_source_stream(self, source: Source) -> Iterator[str]:
+        """
+        Yields the text of the source in consecutive pieces. Handlers that can
+        extract text incrementally override this, the default reads it at once.
+        """
+        for piece in (self._read_source(source),):
+            assert isinstance(piece, str), "Read source must return a string"
+            yield piece
@@ -0,0 +1,89 @@
+import importlib
+import importlib.util
+import logging
+import os
+import pickle
+import sys
+
+# Long-lived parser worker started by the ParserPool. It reads (extension, path)
+# requests from stdin and writes the extracted text back to stdout, both as
+# pickled messages. The worker is started as a plain script so it does not
+# import the semantic_index package (models, database, API) at all.
+
+# small pieces (e.g. paragraphs) are sent in batches of at least this size
+_SEND_CHARS = 1 << 16
+
+
+class _PipeLogHandler(logging.Handler):
+    def __init__(self, send):
+        super().__init__()
+        self._send = send
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._send(("log", record.levelno, f"{record.name}: {record.getMessage()}"))
+        except Exception:
+            self.handleError(record)
+
+
+def _load_readers():
+    here = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location(
+        "semantic_index_external",
+        os.path.join(here, "__init__.py"),
+        submodule_search_locations=[here],
+    )
+    assert spec and spec.loader, f"Failed to load parsers from {here}"
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = package
+    spec.loader.exec_module(package)
+    return importlib.import_module(f"{spec.name}.readers")
+
+
+def _pickled(error: Exception) -> bytes | None:
+    # the parent chains the original exception (e.g. PermissionError of a
+    # locked file) to its ParserError, so the failure is classified by it
+    try:
+        return pickle.dumps(error, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+
+
+def main() -> None:
+    # the protocol owns the original stdout, stray prints of the parser
+    # libraries are redirected to stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    def send(message: tuple) -> None:
+        pickle.dump(message, out, protocol=pickle.HIGHEST_PROTOCOL)
+        out.flush()
+
+    logging.basicConfig(level=logging.DEBUG, handlers=[_PipeLogHandler(send)])
+    readers = _load_readers()
+
+    while True:
+        try:
+            ext, path = pickle.load(sys.stdin.buffer)
+        except EOFError:
+            return
+
+        try:
+            batch, size = [], 0
+            for piece in readers.extension_to_reader[ext](path):
+                batch.append(piece)
+                size += len(piece)
+                if size >= _SEND_CHARS:
+                    send(("piece", "".join(batch)))
+                    batch, size = [], 0
+            if batch:
+                send(("piece", "".join(batch)))
+        except Exception as e:
+            send(("error", type(e).__name__, str(e), _pickled(e)))
+        else:
+            send(("done",))
+
+
+if __name__ == "__main__":
+    main()
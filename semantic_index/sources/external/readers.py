@@ -0,0 +1,182 @@
+import importlib
+import logging
+import sys
+import os
+from typing import TYPE_CHECKING, Iterator
+
+from .process import run_subprocess_with_timeout
+
+# the parsing libraries are imported by the readers when first used, most runs
+# only need a few of them and importing all of them is slow
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# set by the parser pool for its worker processes
+PARSER_WORKER_ENV = "SEMANTIC_INDEX_PARSER_WORKER"
+
+
+# plaintext is decoded in blocks, the encoding is detected on the first block
+_PLAINTEXT_BLOCK_SIZE = 1 << 20
+# spreadsheets are converted to CSV in blocks of rows
+_SHEET_ROW_BLOCK_SIZE = 10_000
+
+
+def _run_external(script: str, function: str, path: str) -> str:
+    if os.environ.get(PARSER_WORKER_ENV):
+        # a parser worker is isolated and time limited already, so the script
+        # can run in-process instead of starting another interpreter per file
+        module = importlib.import_module(f".{script}", __package__)
+        return getattr(module, function)(path)
+
+    read_script = os.path.join(os.path.dirname(__file__), f"{script}.py")
+    assert os.path.isfile(read_script), f"Script not found: {read_script}"
+    cmd = [sys.executable, read_script, path]
+    return run_subprocess_with_timeout(cmd, timeout_seconds=30)
+
+
+def _read_plaintext(path: str) -> Iterator[str]:
+    from charset_normalizer import from_bytes
+
+    with open(path, "rb") as f:
+        sample = f.read(_PLAINTEXT_BLOCK_SIZE)
+
+    result = from_bytes(sample).best()
+    if result is None:
+        logger.warning(f"Failed to detect encoding for file: {path}, using fallback")
+        encoding = "utf-8"
+    else:
+        encoding = result.encoding
+        logger.debug(f"Detected encoding '{encoding}' for file: {path}")
+
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        while block := f.read(_PLAINTEXT_BLOCK_SIZE):
+            yield block
+
+
+def _iter_sheets(sheets: "dict[str, pd.DataFrame]") -> Iterator[str]:
+    for sheet_name, sheet_df in sheets.items():
+        yield f"--- Sheet: {sheet_name} ---\n"
+        if sheet_df.empty:
+            yield sheet_df.to_csv(index=False)
+        for start in range(0, len(sheet_df), _SHEET_ROW_BLOCK_SIZE):
+            block = sheet_df.iloc[start : start + _SHEET_ROW_BLOCK_SIZE]
+            yield block.to_csv(index=False, header=start == 0)
+        yield "\f"  # a page break, for chunking
+
+
+def _read_pandas(path: str) -> Iterator[str]:
+    import pandas as pd
+
+    yield from _iter_sheets(pd.read_excel(path, sheet_name=None))
+
+
+def _read_excel(path: str) -> Iterator[str]:
+    import pandas as pd
+
+    try:
+        sheets = pd.read_excel(path, sheet_name=None)
+    except Exception as e:
+        logger.warning(
+            (
+                f"Pandas failed to read Excel file {path} with error: {e}. "
+                "Falling back to external script."
+            )
+        )
+    else:
+        yield from _iter_sheets(sheets)
+        return
+
+    try:
+        assert os.path.isfile(path), f"Excel file not found: {path}"
+        result = _run_external("read_excel", "_read_excel_file", path)
+    except Exception as e:
+        logger.error(f"Failed to read Excel file {path} with external script: {e}")
+        raise
+    yield result
+
+
+def _read_odt(path: str) -> Iterator[str]:
+    from odf import text, teletype
+    from odf.opendocument import load
+
+    document = load(path)
+    for paragraph in document.getElementsByType(text.P):
+        yield teletype.extractText(paragraph) + "\n\n"
+
+
+def _read_docx(path: str) -> Iterator[str]:
+    import docx
+
+    try:
+        doc = docx.Document(path)
+    except Exception as e:
+        logger.warning(
+            (
+                f"python-docx failed to read DOCX file {path} with error: {e}. "
+                "Falling back to external script."
+            )
+        )
+        yield from _read_word(path)
+        return
+
+    for para in doc.paragraphs:
+        yield para.text + "\n\n"
+
+
+def _read_word(path: str) -> Iterator[str]:
+    try:
+        assert os.path.isfile(path), f"Word file not found: {path}"
+        result = _run_external("read_word", "_read_word_file", path)
+    except Exception as e:
+        logger.error(f"Failed to read Word file {path} with external script: {e}")
+        raise
+    yield result
+
+
+def _read_pdf(path: str) -> Iterator[str]:
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        for page in doc:
+            yield str(page.get_text()) + "\f"
+
+
+def _read_msg(path: str) -> Iterator[str]:
+    import extract_msg
+    from extract_msg import Message
+
+    with extract_msg.Message(path) as mail:  # type: ignore
+        mail: Message = mail
+        result = f"{mail.sender} -> {mail.to}\n{mail.date}: {mail.subject}\n{mail.body}"
+    yield result
+
+
+extension_to_reader = {
+    ".txt": _read_plaintext,
+    ".md": _read_plaintext,
+    ".pdf": _read_pdf,
+    ".msg": _read_msg,
+    # docs
+    ".odt": _read_odt,
+    ".doc": _read_word,
+    ".dot": _read_word,
+    ".wbk": _read_docx,
+    ".docx": _read_docx,
+    ".docm": _read_docx,
+    ".dotx": _read_docx,
+    ".dotm": _read_docx,
+    # Spreadsheet
+    ".ods": _read_pandas,
+    ".csv": _read_plaintext,
+    ".tsv": _read_plaintext,
+    ".xls": _read_excel,
+    ".xlt": _read_excel,
+    ".xla": _read_excel,
+    ".xlsx": _read_excel,
+    ".xlsm": _read_excel,
+    ".xltx": _read_excel,
+    ".xltm": _read_excel,
+    ".xlsb": _read_excel,
+}
@@ -4,7 +4,7 @@ from datetime import datetime
 from typing import Iterator
 
 from ..data import Source
-from .io import get_file_extension, supported_extensions, extension_to_reader
+from .io import get_file_extension, iter_file, read_file
 from .base_handler import BaseSourceHandler
 
 logger = logging.getLogger(__name__)
@@ -31,7 +31,9 @@ class FileSourceHandler(BaseSourceHandler):
             raise ValueError(f"Source path is not a file: {uri}")
 
         stat = os.stat(uri)
-        obj_created = datetime.fromtimestamp(stat.st_birthtime)
+        # the creation time is not available on every platform (e.g. Linux)
+        birthtime = getattr(stat, "st_birthtime", min(stat.st_ctime, stat.st_mtime))
+        obj_created = datetime.fromtimestamp(birthtime)
         obj_modified = datetime.fromtimestamp(stat.st_mtime)
         if obj_created > obj_modified:
             logger.warning(
@@ -55,6 +57,7 @@ class FileSourceHandler(BaseSourceHandler):
             title=os.path.basename(uri),
             obj_created=obj_created,
             obj_modified=obj_modified,
+            obj_size=stat.st_size,
             last_checked=datetime.now(),
             last_processed=None,
             error=False,
@@ -63,9 +66,7 @@ class FileSourceHandler(BaseSourceHandler):
         )
 
     def _read_source(self, source: Source) -> str:
-        ext = get_file_extension(source.uri)
-        if ext not in supported_extensions:
-            raise ValueError(f"Unsupported file extension: {ext}")
+        return read_file(source.uri)
 
-        reader = extension_to_reader[ext]
-        return reader(source.uri)
+    def _read_source_stream(self, source: Source) -> Iterator[str]:
+        return iter_file(source.uri)
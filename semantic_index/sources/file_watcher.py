@@ -0,0 +1,235 @@
+import abc
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from ..config import WatchConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FileChange:
+    """
+    A created, modified or deleted file. For directories, a change means that
+    everything below has to be indexed again (e.g. a directory moved into the
+    watched tree), a deletion that everything below is gone.
+    """
+
+    path: str
+    deleted: bool = False
+    is_dir: bool = False
+
+
+class FileWatcher(abc.ABC):
+    def __init__(self, base: str):
+        if not os.path.isdir(base):
+            raise ValueError(f"Base path is not a directory: {base}")
+        self.base = base
+
+    @abc.abstractmethod
+    def read_changes(self, timeout: Optional[float]) -> list[FileChange]:
+        """
+        Returns the changes since the last call, waiting up to timeout seconds
+        (forever if None) for at least one change to happen.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "FileWatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class PollingFileWatcher(FileWatcher):
+    """Detects changes by comparing snapshots of the directory tree."""
+
+    def __init__(self, base: str, poll_interval: float):
+        super().__init__(base)
+        self._poll_interval = poll_interval
+        self._snapshot = self._scan()
+        self._scanned = time.monotonic()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot: dict[str, tuple[int, int]] = {}
+        todo = [self.base]
+        while todo:
+            try:
+                entries = list(os.scandir(todo.pop()))
+            except OSError as e:
+                logger.warning(f"Failed to scan directory: {e}")
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        todo.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue  # removed while scanning
+        return snapshot
+
+    def read_changes(self, timeout: Optional[float]) -> list[FileChange]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            next_scan = self._scanned + self._poll_interval
+            if deadline is not None and next_scan > deadline:
+                time.sleep(max(deadline - time.monotonic(), 0))
+                return []
+            time.sleep(max(next_scan - time.monotonic(), 0))
+
+            snapshot = self._scan()
+            self._scanned = time.monotonic()
+            changes = [
+                FileChange(path)
+                for path, state in snapshot.items()
+                if self._snapshot.get(path) != state
+            ]
+            changes.extend(
+                FileChange(path, deleted=True)
+                for path in self._snapshot.keys() - snapshot.keys()
+            )
+            self._snapshot = snapshot
+            if changes:
+                return changes
+
+
+# see inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 1 << 16
+
+
+class InotifyFileWatcher(FileWatcher):
+    """Receives changes from the Linux kernel, with one watch per directory."""
+
+    def __init__(self, base: str):
+        super().__init__(base)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise self._os_error("inotify_init1")
+        self._paths_by_wd: dict[int, str] = {}
+        self._wds_by_path: dict[str, int] = {}
+        try:
+            self._add_tree(base)
+        except Exception:
+            self.close()
+            raise
+
+    def _os_error(self, call: str, path: str | None = None) -> OSError:
+        code = ctypes.get_errno()
+        message = f"{call} failed: {os.strerror(code)}"
+        if code == errno.ENOSPC:
+            message += " (raise fs.inotify.max_user_watches)"
+        return OSError(code, message, path)
+
+    def _add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            if ctypes.get_errno() in (errno.ENOENT, errno.ENOTDIR):
+                return  # removed in the meantime
+            raise self._os_error("inotify_add_watch", path)
+        self._paths_by_wd[wd] = path
+        self._wds_by_path[path] = wd
+
+    def _add_tree(self, base: str) -> None:
+        for root, _, _ in os.walk(base):
+            self._add_watch(root)
+
+    def _remove_tree(self, base: str) -> None:
+        # a directory moved out of the tree keeps its watches, drop them
+        prefix = os.path.join(base, "")
+        paths = [p for p in self._wds_by_path if p == base or p.startswith(prefix)]
+        for path in paths:
+            wd = self._wds_by_path.pop(path)
+            self._paths_by_wd.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read_changes(self, timeout: Optional[float]) -> list[FileChange]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        data = os.read(self._fd, _READ_SIZE)
+        changes: list[FileChange] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                logger.warning(f"Missed file changes in {self.base}, rescanning.")
+                changes.append(FileChange(self.base, is_dir=True))
+                continue
+            if mask & _IN_IGNORED:
+                path = self._paths_by_wd.pop(wd, None)
+                if path is not None and self._wds_by_path.get(path) == wd:
+                    del self._wds_by_path[path]
+                continue
+
+            parent = self._paths_by_wd.get(wd)
+            if parent is None or not name:
+                continue  # events of the watched directory itself
+            path = os.path.join(parent, name)
+
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._add_tree(path)
+                    changes.append(FileChange(path, is_dir=True))
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    self._remove_tree(path)
+                    changes.append(FileChange(path, deleted=True, is_dir=True))
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                changes.append(FileChange(path))
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                changes.append(FileChange(path, deleted=True))
+        return changes
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_file_watcher(base: str, watch_config: WatchConfig) -> FileWatcher:
+    if watch_config.use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyFileWatcher(base)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+    return PollingFileWatcher(base, watch_config.poll_interval_seconds)
@@ -1,21 +1,34 @@
 import logging
-from typing import Iterator
-import requests
+from typing import TYPE_CHECKING, Iterator
 from datetime import datetime
 from enum import Enum
 
 from ..data import Source
 from ..config import config
 from .base_handler import BaseSourceHandler
+from ..metrics import metrics
 from .io import (
     get_file_extension,
     supported_extensions,
-    extension_to_reader,
+    iter_file,
     TempDirectory,
 )
 
+if TYPE_CHECKING:
+    import requests
+
 logger = logging.getLogger(__name__)
 
+_request_seconds = metrics.histogram(
+    "semantic_index_jira_request_seconds",
+    "Latency of requests against the Jira API",
+)
+_responses = metrics.counter(
+    "semantic_index_jira_responses_total",
+    "Responses received from the Jira API",
+    ["status"],
+)
+
 
 class JiraType(Enum):
     ISSUE = 0
@@ -27,12 +40,18 @@ class JiraSourceHandler(BaseSourceHandler):
     def get_name(self) -> str:
         return "Jira"
 
-    def _jira_auth_req(self, url: str, params: dict = {}) -> requests.Response:
+    def _jira_auth_req(
+        self, url: str, params: dict = {}, stream: bool = False
+    ) -> "requests.Response":
+        import requests
+
         headers = {
             "Authorization": f"Bearer {config.jira.api_key}",
             "Content-Type": "application/json",
         }
-        response = requests.get(url, headers=headers, params=params)
+        with _request_seconds.time():
+            response = requests.get(url, headers=headers, params=params, stream=stream)
+        _responses.inc(status=str(response.status_code))
         response.raise_for_status()
         return response
 
@@ -119,6 +138,7 @@ class JiraSourceHandler(BaseSourceHandler):
             title=f"Jira {key_insert}Attachment: {filename}",
             obj_created=cdate,
             obj_modified=mdate,
+            obj_size=data.get("size") or 0,
             last_checked=datetime.now(),
             last_processed=None,
             error=False,
@@ -181,10 +201,15 @@ class JiraSourceHandler(BaseSourceHandler):
         elif type_ == JiraType.COMMENT:
             return self._read_comment(source)
         elif type_ == JiraType.ATTACHMENT:
-            return self._read_attachment(source)
+            return "".join(self._read_attachment(source))
 
         raise NotImplementedError(f"Unknown type: {source.uri}")
 
+    def _read_source_stream(self, source: Source) -> Iterator[str]:
+        if self.get_type_enum(source.uri) == JiraType.ATTACHMENT:
+            return self._read_attachment(source)
+        return super()._read_source_stream(source)
+
     def _read_issue(self, source: Source) -> str:
         data = self._jira_auth_req(source.uri).json()
 
@@ -283,7 +308,7 @@ class JiraSourceHandler(BaseSourceHandler):
             f"Content:\n{body}"
         )
 
-    def _read_attachment(self, source: Source) -> str:
+    def _read_attachment(self, source: Source) -> Iterator[str]:
         metadata = self._jira_auth_req(source.uri).json()
 
         filename = metadata.get("filename", "N/A")
@@ -291,27 +316,35 @@ class JiraSourceHandler(BaseSourceHandler):
         if ext not in supported_extensions:
             raise ValueError(f"Unsupported attachment extension: {ext}")
 
-        assert source.resolved_to
-        with TempDirectory() as temp_dir:
-            binary = self._jira_auth_req(source.resolved_to).content
-            temp_path = temp_dir / filename
-            with open(temp_path, "wb") as f:
-                f.write(binary)
-            reader = extension_to_reader[ext]
-            content = reader(str(temp_path))
-
         author = (metadata.get("author") or {}).get("displayName", "N/A")
         created = metadata.get("created", "N/A")
         updated = metadata.get("updated", created)
         update_author = (metadata.get("updateAuthor") or {}).get("displayName", "N/A")
         size = metadata.get("size", "N/A")
         mime_type = metadata.get("mimeType", "N/A")
-        body = content if content else "<no content>"
 
-        return (
+        yield (
             f"JIRA Attachment: {filename}\n"
             f"Mime Type: {mime_type} / Size: {size} bytes\n"
             f"Uploaded by: {author} / Created: {created}\n"
             f"Last updated by: {update_author} / Updated: {updated}\n"
-            f"Content:\n{body}"
+            f"Content:\n"
         )
+
+        assert source.resolved_to
+        has_content = False
+        with TempDirectory() as temp_dir:
+            temp_path = temp_dir / filename
+            with (
+                self._jira_auth_req(source.resolved_to, stream=True) as response,
+                open(temp_path, "wb") as f,
+            ):
+                for block in response.iter_content(chunk_size=1 << 20):
+                    f.write(block)
+
+            for piece in iter_file(str(temp_path)):
+                has_content = has_content or bool(piece)
+                yield piece
+
+        if not has_content:
+            yield "<no content>"
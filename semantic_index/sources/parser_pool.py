@@ -0,0 +1,283 @@
+import atexit
+import logging
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import Iterator, Optional
+
+from .external.readers import PARSER_WORKER_ENV
+from ..config import ParserPoolConfig, config
+from ..metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "external", "parser_worker.py")
+# interval to check the memory of a busy worker
+_POLL_SECONDS = 1.0
+# messages buffered per worker, a slow consumer blocks the worker beyond that
+_MAX_BUFFERED = 16
+
+_workers_running = metrics.gauge(
+    "semantic_index_parser_workers",
+    "Running parser worker processes",
+)
+_workers_replaced = metrics.counter(
+    "semantic_index_parser_workers_replaced_total",
+    "Parser worker processes stopped and replaced, by reason",
+    ["reason"],
+)
+
+
+class ParserError(Exception):
+    """Raised when a parser worker fails to extract the text of a file."""
+
+
+def _unpickled(data: bytes | None) -> BaseException | None:
+    """The exception raised by the parser in the worker, if it can be restored."""
+    if data is None:
+        return None
+    try:
+        error = pickle.loads(data)
+    except Exception:
+        return None
+    return error if isinstance(error, BaseException) else None
+
+
+def _get_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None  # not available on this platform
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+
+
+class _ParserWorker:
+    def __init__(self):
+        env = dict(os.environ)
+        env[PARSER_WORKER_ENV] = "1"
+        # parsers are single threaded, avoid thread pools of numeric libraries
+        env.setdefault("OMP_NUM_THREADS", "1")
+        env.setdefault("OPENBLAS_NUM_THREADS", "1")
+
+        self.process = subprocess.Popen(
+            [sys.executable, _WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        self.tasks = 0
+        self.busy = False
+        self.closed = False
+        self._messages: queue.Queue[Optional[tuple]] = queue.Queue(_MAX_BUFFERED)
+        threading.Thread(target=self._receive, daemon=True).start()
+        logger.debug(f"Started parser worker {self.process.pid}")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _receive(self) -> None:
+        assert self.process.stdout
+        while True:
+            try:
+                message = pickle.load(self.process.stdout)
+            except Exception:
+                message = None  # worker exited
+
+            while not self.closed:
+                try:
+                    self._messages.put(message, timeout=_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    continue
+
+            if message is None or self.closed:
+                return
+
+    def parse(
+        self, path: str, ext: str, timeout_seconds: float, max_memory_mb: float
+    ) -> Iterator[str]:
+        """Yields the text of a file as extracted by the worker.
+
+        Only the time spent waiting for the worker counts towards the timeout,
+        not the time the caller spends between pieces.
+        """
+        assert self.process.stdin
+        self.tasks += 1
+        self.busy = True
+        pid = self.process.pid
+        try:
+            pickle.dump((ext, path), self.process.stdin)
+            self.process.stdin.flush()
+        except OSError as e:
+            self.kill("crash")
+            raise ParserError(f"Parser worker {pid} is not responding: {e}") from e
+
+        waited = 0.0
+        last_checked = time.perf_counter()
+        while True:
+            remaining = timeout_seconds - waited
+            if remaining <= 0:
+                self.kill("timeout")
+                raise TimeoutError(
+                    f"Parsing {path} timed out after {timeout_seconds} seconds"
+                )
+
+            started = time.perf_counter()
+            try:
+                message = self._messages.get(timeout=min(remaining, _POLL_SECONDS))
+            except queue.Empty:
+                message = ()
+            waited += time.perf_counter() - started
+
+            if max_memory_mb > 0 and started - last_checked >= _POLL_SECONDS:
+                last_checked = started
+                rss_mb = _get_rss_mb(pid)
+                if rss_mb is not None and rss_mb > max_memory_mb:
+                    self.kill("memory")
+                    raise ParserError(
+                        (
+                            f"Parsing {path} exceeded the memory limit of "
+                            f"{max_memory_mb} MB ({rss_mb:.0f} MB)"
+                        )
+                    )
+
+            if message is None:
+                self.kill("crash")
+                raise ParserError(
+                    (
+                        f"Parser worker {pid} exited with code "
+                        f"{self.process.returncode} while parsing {path}"
+                    )
+                )
+            if not message:
+                continue
+
+            kind = message[0]
+            if kind == "piece":
+                yield message[1]
+            elif kind == "log":
+                logger.log(message[1], f"Parser worker {pid}: {message[2]}")
+            elif kind == "done":
+                self.busy = False
+                return
+            elif kind == "error":
+                self.busy = False
+                raise ParserError(
+                    f"Failed to parse {path}: {message[1]}: {message[2]}"
+                ) from _unpickled(message[3])
+
+    def stop(self) -> None:
+        self.closed = True
+        try:
+            assert self.process.stdin
+            self.process.stdin.close()  # the worker exits on end of input
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+        _workers_running.dec()
+
+    def kill(self, reason: str) -> None:
+        self.closed = True
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+        _workers_running.dec()
+        _workers_replaced.inc(reason=reason)
+        logger.warning(f"Stopped parser worker {self.process.pid} ({reason})")
+
+
+class ParserPool:
+    """Extracts the text of files in a pool of long-lived worker processes.
+
+    Each file is subject to a timeout and a memory limit, a worker exceeding them
+    or crashing is killed and replaced on the next request. Workers are also
+    replaced after a number of files to release memory leaked by the parsers.
+    """
+
+    def __init__(self, pool_config: ParserPoolConfig):
+        self._config = pool_config
+        self._slots = threading.BoundedSemaphore(max(1, pool_config.workers))
+        self._idle: list[_ParserWorker] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def iter_file(self, path: str, ext: str) -> Iterator[str]:
+        # the parser runs in a separate process, relative paths would depend
+        # on its working directory
+        path = os.path.abspath(path)
+        worker = self._acquire()
+        try:
+            yield from worker.parse(
+                path,
+                ext,
+                self._config.timeout_seconds,
+                self._config.max_memory_mb,
+            )
+        finally:
+            self._release(worker)
+
+    def _acquire(self) -> _ParserWorker:
+        self._slots.acquire()
+        try:
+            with self._lock:
+                assert not self._shutdown, "Parser pool is shut down"
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive:
+                        return worker
+                    worker.kill("crash")
+
+            worker = _ParserWorker()
+            _workers_running.inc()
+            return worker
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: _ParserWorker) -> None:
+        try:
+            if worker.closed:
+                return  # killed while parsing, already accounted for
+            if not worker.alive:
+                worker.kill("crash")
+            elif worker.busy:
+                # the caller stopped reading in the middle of a file
+                worker.kill("abandoned")
+            elif worker.tasks >= self._config.max_tasks_per_worker:
+                worker.stop()
+                _workers_replaced.inc(reason="recycled")
+            else:
+                with self._lock:
+                    if not self._shutdown:
+                        self._idle.append(worker)
+                        return
+                worker.stop()
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._shutdown = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+_pool: Optional[ParserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_parser_pool() -> ParserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParserPool(config.parser_pool)
+            atexit.register(_pool.shutdown)
+        return _pool